@@ -1,26 +1,202 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash, send_from_directory
-import json
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash, make_response, g
+from flask import before_render_template, current_app, template_rendered
+import gc
 import os
-import re
+import time
+import click
 from werkzeug.utils import secure_filename
 from datetime import datetime
 
-app = Flask(__name__, static_folder='static', template_folder='templates')
-app.secret_key = os.environ.get('SECRET_KEY', 'game-platform-secret-key-2025')
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+from assets import StaticAssets
+from blobs import BlobStore
+from bus import ALL, create_bus
+from counters import BufferedCounters
+from deferred import DeferredSetup
+from pagecache import PageCache
+from pagination import PaginationError, decode_cursor, encode_cursor, paginate, parse_limit
+from ranking import RANKING_KINDS, Rankings
+from search import SearchIndex
+from images import generate_thumbnails, remove_thumbnails
+from jobs import JobQueue
+from optimizer import OPTIMIZER_VERSION, BUILD_DIR, build_game
+import metrics
+from scanner import ContentScanner
+from storage import create_backend
+from uploads import UnsafeContentError, ingest_upload
 
-# Для Netlify - используем абсолютные пути
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, 'data')
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+
+# Маршруты и обработчики объявляются ниже, а в приложение их добавляет create_app()
+views = DeferredSetup()
+
+# Хранилище, индексы и очередь задач создает create_app(): импорт модуля
+# не читает и не создает файлов. В процессе работает одно приложение.
+DATA_DIR = None
+OPTIMIZE_GAMES = True
+storage = None        # пользователи и игры (JSON файлы или SQLite) со счетчиками в памяти
+blob_store = None     # файлы игр и обложек по хешу содержимого с подсчетом ссылок
+assets = None         # отдача static с отпечатками в адресах, ETag и сжатыми копиями
+rankings = None       # рейтинги игр (лайки, запуски, новые, trending)
+search_index = None   # поиск по названию, описанию и автору
+page_cache = None     # готовые страницы каталога
+jobs = None           # фоновые задачи (миниатюры, сборка и сжатие загруженных игр)
+profiler = None       # сэмплирующий профилировщик медленных запросов (PROFILE_REQUESTS=1)
+changes_bus = None    # уведомления об изменениях для кэшей этого и других воркеров
+
+# Метрики для /metrics (см. metrics.py)
+REQUEST_SECONDS = metrics.histogram('gameform_http_request_seconds', 'Длительность обработки запроса',
+                                    ('endpoint', 'method', 'status'))
+TEMPLATE_SECONDS = metrics.histogram('gameform_template_render_seconds', 'Отрисовка шаблона', ('template',))
+SLOW_REQUESTS = metrics.counter('gameform_slow_requests_total', 'Запросы дольше SLOW_REQUEST_MS', ('endpoint',))
+
+
+def default_config():
+    """Настройки приложения из переменных окружения"""
+    env = os.environ
+    return {
+        'SECRET_KEY': env.get('SECRET_KEY', 'game-platform-secret-key-2025'),
+        'MAX_CONTENT_LENGTH': 16 * 1024 * 1024,
+        # Для Netlify - используем абсолютные пути
+        'DATA_DIR': env.get('DATA_DIR', os.path.join(BASE_DIR, 'data')),
+        # Хранилище: json (файлы в DATA_DIR) или sqlite (SQLITE_PATH, по умолчанию DATA_DIR/gameform.db)
+        'STORAGE_BACKEND': env.get('STORAGE_BACKEND', 'json'),
+        'SQLITE_PATH': env.get('SQLITE_PATH'),
+        # Журнал событий JSON хранилища сворачивается в снимок раз в интервал (с) или при этом размере
+        'EVENT_LOG_COMPACT_INTERVAL': float(env.get('EVENT_LOG_COMPACT_INTERVAL', 60)),
+        'EVENT_LOG_MAX_BYTES': int(env.get('EVENT_LOG_MAX_BYTES', 1024 * 1024)),
+        # Запуски и лайки копятся в памяти и периодически сбрасываются на диск
+        'COUNTER_FLUSH_INTERVAL': float(env.get('COUNTER_FLUSH_INTERVAL', 5)),
+        'COUNTER_FLUSH_THRESHOLD': int(env.get('COUNTER_FLUSH_THRESHOLD', 100)),
+        # Кэш страниц каталога; сбрасывается маршрутами, которые меняют игры или пользователей
+        'PAGE_CACHE_TTL': float(env.get('PAGE_CACHE_TTL', 30)),
+        'PAGE_CACHE_MAX_STALE': float(env.get('PAGE_CACHE_MAX_STALE', 300)),
+        # Оптимизация HTML игр при загрузке (минификация, вынос больших скриптов и стилей)
+        'OPTIMIZE_GAMES': env.get('OPTIMIZE_GAMES', '1') != '0',
+        # Задачи выполняются потоками приложения; при JOB_WORKERS=0 - только
+        # отдельным процессом (flask jobs-worker). JOBS_DB по умолчанию - DATA_DIR/jobs.db
+        'JOBS_DB': env.get('JOBS_DB'),
+        'JOB_WORKERS': int(env.get('JOB_WORKERS', 2)),
+        'JOB_MAX_ATTEMPTS': int(env.get('JOB_MAX_ATTEMPTS', 3)),
+        # Уведомления об изменениях между воркерами: file - через общий журнал
+        # (CHANGE_BUS_FILE, по умолчанию DATA_DIR/bus.jsonl), local - один процесс
+        'CHANGE_BUS': env.get('CHANGE_BUS', 'file'),
+        'CHANGE_BUS_FILE': env.get('CHANGE_BUS_FILE'),
+        # Доступ к /metrics: если задан токен, нужен заголовок Authorization: Bearer <токен>
+        'METRICS_TOKEN': env.get('METRICS_TOKEN', ''),
+        # Запросы дольше порога (мс) пишутся в лог; 0 - не писать
+        'SLOW_REQUEST_MS': float(env.get('SLOW_REQUEST_MS', 1000)),
+        # Для медленных запросов в лог добавляются места, где они провели больше всего времени
+        'PROFILE_REQUESTS': env.get('PROFILE_REQUESTS') == '1',
+        # Прочитать каталог и построить индексы сразу (см. preload())
+        'PRELOAD': env.get('PRELOAD') == '1'
+    }
+
 
-USERS_FILE = os.path.join(DATA_DIR, 'users.json')
-GAMES_FILE = os.path.join(DATA_DIR, 'games.json')
+def create_app(config=None):
+    """Создает приложение: настройки из окружения, поверх них - config.
+
+    Здесь же создаются папки данных, хранилище и индексы (сами данные
+    читаются лениво, при первом обращении). С PRELOAD каталог читается
+    сразу - так делается при запуске сервера с предзагрузкой (gunicorn
+    --preload 'app:create_app()'): воркеры получают готовые данные от
+    родителя вместо того, чтобы каждый читал их заново.
+    """
+    global DATA_DIR, OPTIMIZE_GAMES, storage, blob_store, assets, rankings, search_index, page_cache, jobs, profiler
+    global changes_bus
+
+    # Встроенный маршрут /static отключен: static отдает serve_static с кэшированием и сжатием
+    app = Flask(__name__, static_folder=None, template_folder='templates')
+    app.config.update(default_config())
+    app.config.update(config or {})
+    config = app.config
+
+    DATA_DIR = config['DATA_DIR']
+    OPTIMIZE_GAMES = config['OPTIMIZE_GAMES']
+    os.makedirs(DATA_DIR, exist_ok=True)
+    os.makedirs(os.path.join(STATIC_DIR, 'games'), exist_ok=True)
+    os.makedirs(os.path.join(STATIC_DIR, 'images'), exist_ok=True)
+
+    backend = create_backend(DATA_DIR, config['STORAGE_BACKEND'], sqlite_path=config['SQLITE_PATH'],
+                             compact_interval=config['EVENT_LOG_COMPACT_INTERVAL'],
+                             compact_bytes=config['EVENT_LOG_MAX_BYTES'])
+    storage = BufferedCounters(metrics.TimedStorage(backend),
+                               interval=config['COUNTER_FLUSH_INTERVAL'],
+                               threshold=config['COUNTER_FLUSH_THRESHOLD'])
+    blob_store = BlobStore(STATIC_DIR, os.path.join(DATA_DIR, 'blobs.json'))
+    assets = StaticAssets(STATIC_DIR, routes={'games': 'serve_game', 'images': 'serve_image'})
+    blob_store.on_remove.append(drop_thumbnails)
+    blob_store.on_remove.append(assets.remove_variants)
+    rankings = Rankings(storage)
+    search_index = SearchIndex(storage)
+    page_cache = PageCache(ttl=config['PAGE_CACHE_TTL'], max_stale=config['PAGE_CACHE_MAX_STALE'])
+    jobs = JobQueue(config['JOBS_DB'] or os.path.join(DATA_DIR, 'jobs.db'),
+                    workers=config['JOB_WORKERS'], max_attempts=config['JOB_MAX_ATTEMPTS'])
+    jobs.handler('process_game', on_failure=mark_processing_failed)(process_game)
+    profiler = metrics.SamplingProfiler() if config['PROFILE_REQUESTS'] else None
+    changes_bus = create_bus(config['CHANGE_BUS'], config['CHANGE_BUS_FILE'] or os.path.join(DATA_DIR, 'bus.jsonl'))
+    changes_bus.subscribe(apply_change)
+    changes_bus.poll()  # уведомления, отправленные после этого момента, дойдут до кэшей процесса
+    storage.on_flush.append(broadcast_counters)
+
+    views.init_app(app)
+    before_render_template.connect(start_template_timer, app)
+    template_rendered.connect(record_template_time, app)
+
+    if config['PRELOAD']:
+        preload()
+    return app
+
+
+def preload():
+    """Читает каталог и строит индексы в этом процессе, затем замораживает их для сборщика мусора.
+
+    Вызывается до fork: воркеры наследуют данные и индексы через
+    copy-on-write. gc.freeze() переносит все уже созданные объекты в
+    постоянное поколение, и сборщик мусора воркера не обходит их (обход
+    пишет в заголовки объектов и заставил бы копировать страницы памяти).
+    Потоки (задачи, сброс счетчиков) здесь не запускаются - воркеры
+    запускают свои после fork.
+    """
+    started = time.perf_counter()
+    games = storage.list_games()
+    users = storage.count_users()
+    rankings.sync()
+    search_index.sync()
+    gc.collect()
+    gc.freeze()
+    print(f"Предзагрузка: {users} пользователей, {len(games)} игр, "
+          f"{(time.perf_counter() - started) * 1000:.0f} мс")
+
+
+def apply_change(entity, entity_id):
+    """Обновляет кэши процесса после изменения данных (в этом или другом воркере).
+
+    game - игра изменена, добавлена или удалена; plays - у игры новые
+    запуски; comment - комментарии игры; user - пользователи; ALL - что
+    угодно (часть уведомлений потеряна).
+    """
+    if entity in ('game', 'plays') and entity_id is not None:
+        rankings.refresh(entity_id)
+        if entity == 'game':
+            search_index.refresh(entity_id)
+    elif entity in ('game', ALL):
+        rankings.invalidate()
+        search_index.invalidate()
+    page_cache.invalidate()
+
+
+def broadcast_counters(game_ids):
+    """Запуски и лайки из буфера стали видны другим воркерам только после сброса"""
+    for game_id in game_ids:
+        changes_bus.publish('game', game_id, local=False)
+
+
+def drop_thumbnails(path):
+    """Вместе с обложкой удаляем и ее миниатюры"""
+    if path.startswith('images/'):
+        remove_thumbnails(STATIC_DIR, path)
 
-# Создаем необходимые директории
-os.makedirs(DATA_DIR, exist_ok=True)
-os.makedirs('static/games', exist_ok=True)
-os.makedirs('static/images', exist_ok=True)
-os.makedirs('templates', exist_ok=True)
 
 # Категории игр
 CATEGORIES = [
@@ -39,6 +215,14 @@ CATEGORIES = [
     'Другие'
 ]
 
+# Сортировки главной страницы (рейтинги из ranking.py)
+INDEX_SORTS = [
+    ('likes', 'По популярности'),
+    ('plays', 'По запускам'),
+    ('newest', 'Новые'),
+    ('trending', 'В тренде')
+]
+
 # Запрещенные слова для проверки контента
 FORBIDDEN_WORDS = [
     'porn', 'porno', 'xxx', 'sex', 'nude', 'naked', 'erotic', 'adult', '18+',
@@ -47,99 +231,266 @@ FORBIDDEN_WORDS = [
     'насилие', 'ненависть', 'расизм', 'экстремизм'
 ]
 
-# Создаем необходимые директории
-os.makedirs(DATA_DIR, exist_ok=True)
-os.makedirs('static/games', exist_ok=True)
-os.makedirs('static/images', exist_ok=True)
-os.makedirs('templates', exist_ok=True)
+# Подозрительные подстроки (общее сообщение вместо конкретного слова)
+SUSPICIOUS_PATTERNS = ['porn', 'xxx', 'sex', 'adult', '18+', 'нарко', 'насилие', 'порно']
 
+# Сканер собирается один раз при импорте
+content_scanner = ContentScanner(FORBIDDEN_WORDS, SUSPICIOUS_PATTERNS)
 
-def load_json(filename):
-    """Загружает JSON из файла с обработкой ошибок"""
-    try:
-        if not os.path.exists(filename):
-            print(f"Создаем новый файл: {filename}")
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump([], f, ensure_ascii=False, indent=2)
-            return []
-
-        if os.path.getsize(filename) == 0:
-            return []
-
-        with open(filename, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-            if not content:
-                return []
-            return json.loads(content)
-
-    except (json.JSONDecodeError, Exception) as e:
-        print(f"Ошибка загрузки {filename}: {e}")
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump([], f, ensure_ascii=False, indent=2)
+
+def check_content_safety(html_content):
+    """Проверяет HTML контент на запрещенные слова"""
+    return content_scanner.check(html_content)
+
+
+def file_suffix(filename):
+    """Расширение загруженного файла для имени в хранилище"""
+    return os.path.splitext(secure_filename(filename))[1].lower()
+
+
+def processing_is_current(game, payload):
+    """Игра все еще ссылается на файлы, которые обрабатывала задача"""
+    return all(game.get(field) == payload[field]
+               for field in ('html_file', 'cover_image') if payload.get(field))
+
+
+def mark_processing_failed(payload, error):
+    game = storage.get_game(payload['game_id'])
+    if game and processing_is_current(game, payload):
+        if storage.update_game(game['id'], {'status': 'failed'}, touch=False):
+            changes_bus.publish('game', game['id'])
+
+
+def build_html(html_path):
+    """Оптимизированная сборка игры и сжатые копии ее файлов.
+
+    Возвращает запись для поля build или None, если игра отдается как загружена
+    (оптимизация выключена или файл не в UTF-8). Исходный файл не меняется.
+    """
+    if OPTIMIZE_GAMES:
+        try:
+            build = build_game(STATIC_DIR, html_path)
+        except UnicodeDecodeError as e:
+            print(f"Сборка {html_path} пропущена: {e}")
+        else:
+            for path in [build['html']] + build['assets']:
+                assets.precompress(path)
+            return build
+    assets.precompress(html_path)
+    return None
+
+
+def build_paths(build):
+    """Файлы сборки игры (HTML и вынесенные ресурсы)"""
+    if not build:
         return []
+    return [build['html']] + build.get('assets', [])
+
+
+def release_build(build):
+    """Отпускает ссылки на файлы сборки; файлы без ссылок удаляются вместе со сжатыми копиями"""
+    for path in build_paths(build):
+        blob_store.release(path)
+
 
+def playable_html(game):
+    """Файл для iframe: оптимизированная сборка, если она есть, иначе исходный HTML"""
+    build = game.get('build') or {}
+    if build.get('html') and os.path.exists(os.path.join(STATIC_DIR, build['html'])):
+        return build['html']
+    return game['html_file']
 
-def save_json(filename, data):
-    """Сохраняет данные в JSON файл"""
+
+def process_game(payload):
+    """Обработка файлов игры после загрузки: сборка HTML, сжатые копии и миниатюры обложки"""
+    game = storage.get_game(payload['game_id'])
+    if not game:
+        # Игру удалили, пока задача ждала очереди: ее файлов уже может не быть
+        return {'skipped': 'Игра удалена'}
+    if not processing_is_current(game, payload):
+        return {'skipped': 'Файлы игры заменены'}
+
+    build = build_html(payload['html_file']) if payload.get('html_file') else None
+    # Сборка общая для игр с одинаковым HTML: берем ссылки на ее файлы, как на загрузки
+    for path in build_paths(build):
+        blob_store.acquire(path)
+    thumbnails = generate_thumbnails(STATIC_DIR, payload['cover_image']) if payload.get('cover_image') else None
+
+    game = storage.get_game(payload['game_id'])
+    skipped = None
+    if not game:
+        skipped = 'Игра удалена'
+    elif not processing_is_current(game, payload):
+        # Пока шла обработка, файлы заменили: итог запишет следующая задача
+        skipped = 'Файлы игры заменены'
+    if skipped:
+        release_build(build)
+        return {'skipped': skipped}
+    old_build = game.get('build')
+    updates = {'status': 'ready'}
+    if thumbnails is not None:
+        updates['thumbnails'] = thumbnails
+    if payload.get('html_file'):
+        updates['build'] = build
+    if not storage.update_game(game['id'], updates, touch=False):
+        release_build(build)
+        raise RuntimeError(f"Не удалось сохранить результат обработки игры {game['id']}")
+    changes_bus.publish('game', game['id'])
+    if payload.get('html_file'):
+        release_build(old_build)
+    return {'game_id': game['id'], 'thumbnails': thumbnails, 'build': build}
+
+
+def hold_processing():
+    """Задача обработки, которая начнется после сохранения игры (release_processing)"""
     try:
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        return True
+        return jobs.enqueue('process_game', {}, held=True)
     except Exception as e:
-        print(f"Ошибка сохранения {filename}: {e}")
-        return False
+        print(f"Ошибка очереди задач: {e}")
+        return None
 
 
-def check_content_safety(html_content):
-    """Проверяет HTML контент на запрещенные слова"""
-    content_lower = html_content.lower()
+def release_processing(job_id, game_id, html_file=None, cover_image=None):
+    payload = {'game_id': game_id, 'html_file': html_file, 'cover_image': cover_image}
+    try:
+        if job_id is None:
+            raise RuntimeError('задача не поставлена')
+        jobs.release(job_id, payload)
+    except Exception as e:
+        # Очередь недоступна: обрабатываем сразу, как раньше
+        print(f"Обработка игры {game_id} без очереди ({e})")
+        process_game(payload)
 
-    # Проверяем наличие запрещенных слов
-    for word in FORBIDDEN_WORDS:
-        if word in content_lower:
-            return False, f"Обнаружено запрещенное слово: {word}"
 
-    # Проверяем наличие подозрительных паттернов
-    suspicious_patterns = [
-        r'porn', r'xxx', r'sex', r'adult', r'18\+',
-        r'нарко', r'насилие', r'порно'
-    ]
+def cancel_processing(job_id):
+    if job_id is not None:
+        try:
+            jobs.cancel(job_id)
+        except Exception as e:
+            print(f"Ошибка очереди задач: {e}")
 
-    for pattern in suspicious_patterns:
-        if re.search(pattern, content_lower):
-            return False, "Обнаружен запрещенный контент"
 
-    return True, "Контент прошел проверку"
+@views.template_global('asset_url')
+def asset_url(path):
+    """Адрес файла из static (например, 'css/style.css' или game.cover_image)"""
+    return assets.url(path)
 
 
-def init_data():
-    """Инициализирует данные при запуске"""
-    users = load_json(USERS_FILE)
-    games = load_json(GAMES_FILE)
-    print(f"Инициализировано: {len(users)} пользователей, {len(games)} игр")
+@views.template_filter('srcset')
+def srcset_filter(variants):
+    """{ширина: путь} -> значение атрибута srcset"""
+    return ', '.join(
+        f"{assets.url(path)} {width}w"
+        for width, path in sorted(variants.items(), key=lambda item: int(item[0]))
+    )
 
 
-@app.route('/')
-def index():
-    games = load_json(GAMES_FILE)
-    category = request.args.get('category', '')
+def liked_game_ids():
+    """id игр, которые лайкнул текущий пользователь (для отметки кнопок)"""
+    if 'user_id' not in session:
+        return set()
+    return storage.liked_game_ids(session['user_id'])
+
+
+@views.before_request
+def start_job_workers():
+    # Потоки запускаются при первом запросе, а не при импорте: так они
+    # появляются в каждом воркере сервера, а не только в родителе до fork
+    jobs.start()
 
-    # Фильтрация по категории
-    if category:
-        games = [game for game in games if game.get('category') == category]
 
-    games.sort(key=lambda x: x.get('likes', 0), reverse=True)
-    active_users = len(load_json(USERS_FILE))
+@views.before_request
+def poll_changes():
+    # Изменения других воркеров применяются до того, как запрос прочитает кэши
+    changes_bus.poll()
+
+
+@views.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if profiler:
+        profiler.start()
+
+
+@views.after_request
+def remember_status(response):
+    g.response_status = response.status_code
+    return response
+
+
+@views.teardown_request
+def record_request_metrics(exc):
+    started = g.pop('request_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint or 'unknown'
+    status = g.pop('response_status', 500)
+    REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method, status=status)
+    hot_spots = profiler.stop() if profiler else []
+    slow_ms = current_app.config['SLOW_REQUEST_MS']
+    if slow_ms and elapsed * 1000 >= slow_ms:
+        SLOW_REQUESTS.inc(endpoint=endpoint)
+        print(f"Медленный запрос: {request.method} {request.full_path.rstrip('?')} "
+              f"({endpoint}, {status}) {elapsed * 1000:.0f} мс")
+        if hot_spots:
+            print(f"    Чаще всего выполнялось (сэмплов, раз в {profiler.interval * 1000:.0f} мс):")
+        for place, samples in hot_spots:
+            print(f"    {samples:>5}  {place}")
+
+
+def start_template_timer(sender, template, context, **extra):
+    g.setdefault('template_timers', []).append(time.perf_counter())
+
+
+def record_template_time(sender, template, context, **extra):
+    timers = g.get('template_timers')
+    if timers:
+        TEMPLATE_SECONDS.observe(time.perf_counter() - timers.pop(), template=template.name or 'string')
+
+
+@views.route('/')
+def index():
+    category = request.args.get('category', '')
+    sort = request.args.get('sort', 'likes')
+    if sort not in RANKING_KINDS:
+        sort = 'likes'
+
+    # Страница с непоказанными сообщениями (flash) и неизвестные категории рисуются без кэша.
+    # Остальные кэшируются отдельно для каждой категории, сортировки и пользователя (гостя)
+    # и сбрасываются по уведомлениям об изменениях (apply_change), в том числе других воркеров.
+    if '_flashes' in session or (category and category not in CATEGORIES):
+        return render_index(category, sort)
+    return page_cache.get(('index', category, sort, session.get('user_id')),
+                          lambda: render_index(category, sort))
+
+
+def render_index(category, sort):
+    # Порядок (и фильтр по категории) берем из готового рейтинга
+    games_by_id = {game['id']: game for game in storage.list_games()}
+    games = [games_by_id[value[-1]] for value in rankings.top(sort, category or None)
+             if value[-1] in games_by_id]
+    active_users = storage.count_users()
 
     return render_template('index.html',
                            games=games,
+                           liked_ids=liked_game_ids(),
                            active_users=active_users,
                            categories=CATEGORIES,
-                           current_category=category)
+                           current_category=category,
+                           sorts=INDEX_SORTS,
+                           current_sort=sort)
+
 
+@views.route('/search')
+def search():
+    query = request.args.get('q', '').strip()
+    results = search_index.search(query, limit=60) if query else []
+    games = [game for game in (storage.get_game(game_id) for _, game_id in results) if game]
+    return render_template('search.html', games=games, query=query, liked_ids=liked_game_ids())
 
-@app.route('/about')
+
+@views.route('/about')
 def about():
     """Страница 'О нас' с информацией о платформе и команде"""
     team_members = [
@@ -164,10 +515,11 @@ def about():
         'vision': 'Стать ведущей платформой для indie-разработчиков и любителей игр, предоставляя инструменты для создания, распространения и открытия удивительных игр.'
     }
 
+    games = storage.list_games()
     stats = {
-        'total_games': len(load_json(GAMES_FILE)),
-        'total_users': len(load_json(USERS_FILE)),
-        'total_plays': sum(game.get('plays', 0) for game in load_json(GAMES_FILE))
+        'total_games': len(games),
+        'total_users': storage.count_users(),
+        'total_plays': sum(game.get('plays', 0) for game in games)
     }
 
     return render_template('about.html',
@@ -176,7 +528,7 @@ def about():
                            stats=stats)
 
 
-@app.route('/register', methods=['GET', 'POST'])
+@views.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         username = request.form.get('username', '').strip()
@@ -186,22 +538,20 @@ def register():
             flash('Заполните все поля!')
             return redirect(url_for('register'))
 
-        users = load_json(USERS_FILE)
-
-        if any(user.get('username') == username for user in users):
+        if storage.get_user_by_username(username):
             flash('Пользователь уже существует!')
             return redirect(url_for('register'))
 
         new_user = {
-            'id': len(users) + 1,
             'username': username,
             'password': password,
             'created_at': datetime.now().isoformat(),
             'last_login': datetime.now().isoformat()
         }
 
-        users.append(new_user)
-        if save_json(USERS_FILE, users):
+        new_user = storage.add_user(new_user)
+        if new_user:
+            changes_bus.publish('user', new_user['id'])
             session['username'] = username
             session['user_id'] = new_user['id']
             flash('Регистрация успешна!')
@@ -212,20 +562,18 @@ def register():
     return render_template('register.html')
 
 
-@app.route('/login', methods=['GET', 'POST'])
+@views.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form.get('username', '').strip()
         password = request.form.get('password', '').strip()
 
-        users = load_json(USERS_FILE)
-        user = next((u for u in users if u.get('username') == username and u.get('password') == password), None)
+        user = storage.get_user_by_username(username)
 
-        if user:
+        if user and user.get('password') == password:
             session['username'] = username
             session['user_id'] = user['id']
-            user['last_login'] = datetime.now().isoformat()
-            save_json(USERS_FILE, users)
+            storage.update_user(user['id'], {'last_login': datetime.now().isoformat()})
             flash('Вход успешен!')
             return redirect(url_for('index'))
         else:
@@ -234,14 +582,14 @@ def login():
     return render_template('login.html')
 
 
-@app.route('/logout')
+@views.route('/logout')
 def logout():
     session.clear()
     flash('Вы вышли из системы!')
     return redirect(url_for('index'))
 
 
-@app.route('/upload', methods=['GET', 'POST'])
+@views.route('/upload', methods=['GET', 'POST'])
 def upload_game():
     if 'username' not in session:
         return redirect(url_for('login'))
@@ -265,133 +613,122 @@ def upload_game():
             flash('Файл игры должен быть в формате HTML!')
             return redirect(url_for('upload_game'))
 
-        # Проверка содержимого HTML файла
+        # Проверяем и сохраняем HTML за один проход, затем обложку.
+        # Файлы называются по хешу содержимого, одинаковые загрузки не дублируются;
+        # ссылки на них берутся вместе с сохранением.
         try:
-            html_content = html_file.read().decode('utf-8')
-            html_file.seek(0)  # Сбрасываем позицию чтения файла
-
-            is_safe, message = check_content_safety(html_content)
-            if not is_safe:
-                flash(f'Файл не прошел проверку безопасности: {message}')
-                return redirect(url_for('upload_game'))
-
-        except Exception as e:
+            html_result = ingest_upload(html_file, os.path.join(STATIC_DIR, 'games'),
+                                        scanner=content_scanner, suffix='.html', blob_store=blob_store)
+        except UnsafeContentError as e:
+            flash(f'Файл не прошел проверку безопасности: {e}')
+            return redirect(url_for('upload_game'))
+        except UnicodeDecodeError as e:
             flash(f'Ошибка при проверке файла: {e}')
             return redirect(url_for('upload_game'))
+        except Exception as e:
+            flash(f'Ошибка при сохранении файлов: {e}')
+            return redirect(url_for('upload_game'))
 
-        # Создаем уникальные имена файлов
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        html_filename = secure_filename(f"{session['username']}_{timestamp}_{html_file.filename}")
-        cover_filename = secure_filename(f"{session['username']}_{timestamp}_{cover_image.filename}")
-
-        # Сохраняем файлы
-        html_path = f"games/{html_filename}"
-        cover_path = f"images/{cover_filename}"
-
-        full_html_path = os.path.join('static', html_path)
-        full_cover_path = os.path.join('static', cover_path)
-
+        html_path = f"games/{os.path.basename(html_result.path)}"
         try:
-            html_file.save(full_html_path)
-            cover_image.save(full_cover_path)
-
-            if not os.path.exists(full_html_path):
-                flash('Ошибка: HTML файл не был сохранен!')
-                return redirect(url_for('upload_game'))
-
+            cover_result = ingest_upload(cover_image, os.path.join(STATIC_DIR, 'images'),
+                                         suffix=file_suffix(cover_image.filename), blob_store=blob_store)
         except Exception as e:
+            blob_store.release(html_path)
             flash(f'Ошибка при сохранении файлов: {e}')
             return redirect(url_for('upload_game'))
 
-        # Добавляем игру в базу
-        games = load_json(GAMES_FILE)
-        game_id = len(games) + 1
+        cover_path = f"images/{os.path.basename(cover_result.path)}"
+        # Миниатюры и сжатие - в фоновой задаче, игра пока в статусе pending
+        job_id = hold_processing()
 
+        # Добавляем игру в базу
         new_game = {
-            'id': game_id,
             'title': title,
             'creator': session['username'],
             'creator_id': session['user_id'],
             'description': description,
             'category': category,
             'html_file': html_path,
+            'html_filename': secure_filename(html_file.filename),
+            'html_sha256': html_result.sha256,
             'cover_image': cover_path,
+            'cover_filename': secure_filename(cover_image.filename),
+            'cover_sha256': cover_result.sha256,
+            'thumbnails': {},
+            'status': 'pending',
+            'job_id': job_id,
             'likes': 0,
             'plays': 0,
             'created_at': datetime.now().isoformat(),
             'updated_at': datetime.now().isoformat(),
-            'comments': [],
-            'liked_by': []
+            'comments': []
         }
 
-        games.append(new_game)
-        if save_json(GAMES_FILE, games):
-            flash('Игра успешно загружена!')
+        new_game = storage.add_game(new_game)
+        if new_game:
+            release_processing(job_id, new_game['id'], html_path, cover_path)
+            changes_bus.publish('game', new_game['id'])
+            flash('Игра успешно загружена! Обложка обрабатывается, это займет немного времени.')
             return redirect(url_for('index'))
         else:
+            cancel_processing(job_id)
+            blob_store.release(html_path)
+            blob_store.release(cover_path)
             flash('Ошибка при сохранении данных игры!')
 
     return render_template('upload.html', categories=CATEGORIES)
 
 
-@app.route('/play/<int:game_id>')
+@views.route('/play/<int:game_id>')
 def play_game(game_id):
-    games = load_json(GAMES_FILE)
-    game = next((g for g in games if g.get('id') == game_id), None)
+    game = storage.get_game(game_id)
 
     if game:
         # Проверяем существование файла
-        html_full_path = os.path.join('static', game['html_file'])
-        if not os.path.exists(html_full_path):
+        html_path = playable_html(game)
+        if not os.path.exists(os.path.join(STATIC_DIR, html_path)):
             flash('Файл игры не найден!')
             return redirect(url_for('index'))
 
         # Увеличиваем счетчик игр
-        game['plays'] = game.get('plays', 0) + 1
-        game['updated_at'] = datetime.now().isoformat()
-        save_json(GAMES_FILE, games)
+        plays = storage.increment_plays(game_id)
+        # Запуск пока в буфере этого процесса, другим воркерам о нем сообщит сброс
+        changes_bus.publish('plays', game_id, remote=False)
+        if plays is not None:
+            game = dict(game, plays=plays)
 
-        return render_template('play.html', game=game)
+        return render_template('play.html', game=game, html_path=html_path)
 
     flash('Игра не найдена!')
     return redirect(url_for('index'))
 
 
-@app.route('/like/<int:game_id>')
+@views.route('/like/<int:game_id>')
 def like_game(game_id):
     if 'username' not in session:
         return jsonify({'success': False, 'error': 'Войдите в систему!'})
 
-    games = load_json(GAMES_FILE)
-    game = next((g for g in games if g.get('id') == game_id), None)
+    game = storage.get_game(game_id)
 
     if not game:
         return jsonify({'success': False, 'error': 'Игра не найдена!'})
 
-    user_id = session['user_id']
-    liked_by = game.get('liked_by', [])
-
-    if user_id in liked_by:
-        liked_by.remove(user_id)
-        game['likes'] = max(0, game.get('likes', 0) - 1)
-    else:
-        liked_by.append(user_id)
-        game['likes'] = game.get('likes', 0) + 1
+    result = storage.toggle_like(game_id, session['user_id'])
 
-    game['liked_by'] = liked_by
-    game['updated_at'] = datetime.now().isoformat()
-
-    if save_json(GAMES_FILE, games):
+    if result:
+        likes, is_liked = result
+        changes_bus.publish('game', game_id, remote=False)
         return jsonify({
             'success': True,
-            'likes': game['likes'],
-            'is_liked': user_id in liked_by
+            'likes': likes,
+            'is_liked': is_liked
         })
     else:
         return jsonify({'success': False, 'error': 'Ошибка сохранения!'})
 
 
-@app.route('/comment/<int:game_id>', methods=['POST'])
+@views.route('/comment/<int:game_id>', methods=['POST'])
 def add_comment(game_id):
     if 'username' not in session:
         return jsonify({'success': False, 'error': 'Войдите в систему!'})
@@ -400,39 +737,32 @@ def add_comment(game_id):
     if not comment_text:
         return jsonify({'success': False, 'error': 'Комментарий не может быть пустым!'})
 
-    games = load_json(GAMES_FILE)
-    game = next((g for g in games if g.get('id') == game_id), None)
+    game = storage.get_game(game_id)
 
     if not game:
         return jsonify({'success': False, 'error': 'Игра не найдена!'})
 
-    if 'comments' not in game:
-        game['comments'] = []
-
     new_comment = {
-        'id': len(game['comments']) + 1,
         'user': session['username'],
         'user_id': session['user_id'],
         'text': comment_text,
         'timestamp': datetime.now().isoformat()
     }
 
-    game['comments'].append(new_comment)
-    game['updated_at'] = datetime.now().isoformat()
-
-    if save_json(GAMES_FILE, games):
+    new_comment = storage.add_comment(game_id, new_comment)
+    if new_comment:
+        changes_bus.publish('comment', game_id)
         return jsonify({'success': True, 'comment': new_comment})
     else:
         return jsonify({'success': False, 'error': 'Ошибка сохранения!'})
 
 
-@app.route('/delete_comment/<int:game_id>/<int:comment_id>')
+@views.route('/delete_comment/<int:game_id>/<int:comment_id>')
 def delete_comment(game_id, comment_id):
     if 'username' not in session:
         return jsonify({'success': False, 'error': 'Войдите в систему!'})
 
-    games = load_json(GAMES_FILE)
-    game = next((g for g in games if g.get('id') == game_id), None)
+    game = storage.get_game(game_id)
 
     if not game:
         return jsonify({'success': False, 'error': 'Игра не найдена!'})
@@ -444,38 +774,28 @@ def delete_comment(game_id, comment_id):
     if comment.get('user_id') != session['user_id'] and game.get('creator_id') != session['user_id']:
         return jsonify({'success': False, 'error': 'Нет прав для удаления!'})
 
-    game['comments'] = [c for c in game.get('comments', []) if c.get('id') != comment_id]
-    game['updated_at'] = datetime.now().isoformat()
-
-    if save_json(GAMES_FILE, games):
+    if storage.delete_comment(game_id, comment_id):
+        changes_bus.publish('comment', game_id)
         return jsonify({'success': True})
     else:
         return jsonify({'success': False, 'error': 'Ошибка сохранения!'})
 
 
-@app.route('/delete_game/<int:game_id>')
+@views.route('/delete_game/<int:game_id>')
 def delete_game(game_id):
     if 'username' not in session:
         flash('Войдите в систему!')
         return redirect(url_for('login'))
 
-    games = load_json(GAMES_FILE)
-    game = next((g for g in games if g.get('id') == game_id), None)
+    game = storage.get_game(game_id)
 
     if game and game.get('creator_id') == session['user_id']:
-        # Удаляем файлы
-        try:
-            html_path = os.path.join('static', game['html_file'])
-            cover_path = os.path.join('static', game['cover_image'])
-            if os.path.exists(html_path):
-                os.remove(html_path)
-            if os.path.exists(cover_path):
-                os.remove(cover_path)
-        except Exception as e:
-            print(f"Ошибка удаления файлов: {e}")
-
-        games = [g for g in games if g.get('id') != game_id]
-        if save_json(GAMES_FILE, games):
+        if storage.delete_game(game_id):
+            changes_bus.publish('game', game_id)
+            # Файлы удаляются, когда на них не остается ссылок
+            blob_store.release(game['html_file'])
+            blob_store.release(game['cover_image'])
+            release_build(game.get('build'))
             flash('Игра успешно удалена!')
         else:
             flash('Ошибка при удалении игры!')
@@ -485,13 +805,12 @@ def delete_game(game_id):
     return redirect(url_for('index'))
 
 
-@app.route('/update_game/<int:game_id>', methods=['GET', 'POST'])
+@views.route('/update_game/<int:game_id>', methods=['GET', 'POST'])
 def update_game(game_id):
     if 'username' not in session:
         return redirect(url_for('login'))
 
-    games = load_json(GAMES_FILE)
-    game = next((g for g in games if g.get('id') == game_id), None)
+    game = storage.get_game(game_id)
 
     if not game or game.get('creator_id') != session['user_id']:
         flash('Игра не найдена или нет прав для редактирования!')
@@ -512,77 +831,408 @@ def update_game(game_id):
             flash('Выберите корректную категорию!')
             return redirect(url_for('update_game', game_id=game_id))
 
-        game['title'] = title
-        game['description'] = description
-        game['category'] = category
-        game['updated_at'] = datetime.now().isoformat()
+        updates = {
+            'title': title,
+            'description': description,
+            'category': category
+        }
 
         # Обновляем файлы если загружены новые
         if html_file and html_file.filename:
             if html_file.filename.lower().endswith(('.html', '.htm')):
-                # Проверка содержимого
+                # Проверка содержимого и сохранение за один проход
                 try:
-                    html_content = html_file.read().decode('utf-8')
-                    html_file.seek(0)
-
-                    is_safe, message = check_content_safety(html_content)
-                    if not is_safe:
-                        flash(f'Файл не прошел проверку безопасности: {message}')
-                        return redirect(url_for('update_game', game_id=game_id))
-
+                    html_result = ingest_upload(html_file, os.path.join(STATIC_DIR, 'games'),
+                                                scanner=content_scanner, suffix='.html', blob_store=blob_store)
+                except UnsafeContentError as e:
+                    flash(f'Файл не прошел проверку безопасности: {e}')
+                    return redirect(url_for('update_game', game_id=game_id))
                 except Exception as e:
                     flash(f'Ошибка при проверке файла: {e}')
                     return redirect(url_for('update_game', game_id=game_id))
 
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                html_filename = secure_filename(f"{session['username']}_{timestamp}_{html_file.filename}")
-                html_path = f"games/{html_filename}"
-                full_html_path = os.path.join('static', html_path)
-                html_file.save(full_html_path)
-                game['html_file'] = html_path
+                updates['html_file'] = f"games/{os.path.basename(html_result.path)}"
+                updates['html_filename'] = secure_filename(html_file.filename)
+                updates['html_sha256'] = html_result.sha256
 
         if cover_image and cover_image.filename:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            cover_filename = secure_filename(f"{session['username']}_{timestamp}_{cover_image.filename}")
-            cover_path = f"images/{cover_filename}"
-            full_cover_path = os.path.join('static', cover_path)
-            cover_image.save(full_cover_path)
-            game['cover_image'] = cover_path
-
-        if save_json(GAMES_FILE, games):
+            try:
+                cover_result = ingest_upload(cover_image, os.path.join(STATIC_DIR, 'images'),
+                                             suffix=file_suffix(cover_image.filename), blob_store=blob_store)
+            except Exception as e:
+                if 'html_file' in updates:
+                    blob_store.release(updates['html_file'])
+                flash(f'Ошибка при сохранении файлов: {e}')
+                return redirect(url_for('update_game', game_id=game_id))
+            updates['cover_image'] = f"images/{os.path.basename(cover_result.path)}"
+            updates['cover_filename'] = secure_filename(cover_image.filename)
+            updates['cover_sha256'] = cover_result.sha256
+
+        # Ссылки на новые файлы взяты при сохранении, старые отпускаем после записи игры
+        replaced = [(game[field], updates[field]) for field in ('html_file', 'cover_image') if field in updates]
+        old_build = game.get('build')
+
+        # Новые файлы обрабатываются в фоне; до ее окончания карточка показывает саму обложку
+        job_id = None
+        if 'html_file' in updates or 'cover_image' in updates:
+            job_id = hold_processing()
+            updates.update(status='pending', job_id=job_id)
+            if 'cover_image' in updates:
+                updates['thumbnails'] = {}
+            if 'html_file' in updates:
+                updates['build'] = None
+
+        if storage.update_game(game_id, updates):
+            if 'status' in updates:
+                release_processing(job_id, game_id, updates.get('html_file'), updates.get('cover_image'))
+            changes_bus.publish('game', game_id)
+            for old_path, _ in replaced:
+                blob_store.release(old_path)
+            if 'html_file' in updates:
+                # Старую сборку заменит результат новой обработки
+                release_build(old_build)
             flash('Игра успешно обновлена!')
             return redirect(url_for('index'))
         else:
+            cancel_processing(job_id)
+            for _, new_path in replaced:
+                blob_store.release(new_path)
             flash('Ошибка при обновлении игры!')
 
     return render_template('update_game.html', game=game, categories=CATEGORIES)
 
 
-@app.route('/api/games')
+# Поля игры, которые отдает API (комментарии - отдельным запросом)
+API_GAME_FIELDS = ('id', 'title', 'creator', 'creator_id', 'description', 'category',
+                   'html_file', 'cover_image', 'thumbnails', 'status', 'job_id', 'likes', 'plays',
+                   'comments_count', 'created_at', 'updated_at')
+
+# Порядок списка игр: ключ сортировки по возрастанию, последним идет id
+API_GAME_SORTS = ('likes', 'plays', 'newest', 'title')
+
+
+def api_error(message, status=400):
+    return jsonify({'success': False, 'error': message}), status
+
+
+def catalog_response(build):
+    """JSON ответ API каталога с ETag по версии каталога (с учетом буфера счетчиков).
+
+    Если у клиента уже есть эта версия (If-None-Match), build() не вызывается
+    и отдается 304 без тела.
+    """
+    etag = f"catalog-{storage.catalog_tag()}"
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def parse_fields(value):
+    """?fields=id,title,likes -> кортеж полей (по умолчанию все из API_GAME_FIELDS)"""
+    if not value:
+        return API_GAME_FIELDS
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in API_GAME_FIELDS]
+    if unknown:
+        raise PaginationError(f"Неизвестные поля: {', '.join(unknown)}")
+    return fields
+
+
+def project_game(game, fields):
+    """Только запрошенные поля игры, число комментариев считается отдельно"""
+    result = {}
+    for field in fields:
+        if field == 'comments_count':
+            result[field] = len(game.get('comments', []))
+        elif field == 'status':
+            # Игры, загруженные до фоновой обработки, готовы
+            result[field] = game.get('status', 'ready')
+        elif field in game:
+            result[field] = game[field]
+    return result
+
+
+@views.route('/api/games')
 def api_games():
-    games = load_json(GAMES_FILE)
-    return jsonify(games)
+    """Список игр по страницам: ?category=, ?sort=, ?fields=, ?limit=, ?cursor="""
+    category = request.args.get('category', '')
+    sort = request.args.get('sort', 'likes')
+    if sort not in API_GAME_SORTS:
+        return api_error(f"Неизвестная сортировка: {sort}")
+
+    def build():
+        try:
+            fields = parse_fields(request.args.get('fields'))
+            limit = parse_limit(request.args.get('limit'))
+            after = decode_cursor(request.args.get('cursor'))
+            # Страница берется из отсортированного индекса, а не из сортировки всего каталога
+            values = rankings.top(sort, category or None, limit + 1, tuple(after) if after else None)
+        except PaginationError as e:
+            return api_error(str(e))
+        except TypeError:
+            return api_error('Некорректный cursor')
+
+        page = values[:limit]
+        games = [storage.get_game(value[-1]) for value in page]
+        return jsonify({
+            'games': [project_game(game, fields) for game in games if game],
+            'next_cursor': encode_cursor(list(page[-1])) if len(values) > limit else None
+        })
+
+    return catalog_response(build)
+
+
+@views.route('/api/top')
+def api_top():
+    """Лучшие игры рейтинга: ?kind=likes|plays|newest|trending, ?category=, ?limit=, ?cursor=, ?fields="""
+    kind = request.args.get('kind', 'likes')
+    if kind not in RANKING_KINDS:
+        return api_error(f"Неизвестный рейтинг: {kind}")
+    category = request.args.get('category', '')
+    if category and category not in CATEGORIES:
+        return api_error(f"Неизвестная категория: {category}")
+
+    def build():
+        try:
+            fields = parse_fields(request.args.get('fields'))
+            limit = parse_limit(request.args.get('limit'), default=10)
+            after = decode_cursor(request.args.get('cursor'))
+            values = rankings.top(kind, category or None, limit + 1, tuple(after) if after else None)
+        except PaginationError as e:
+            return api_error(str(e))
+        except TypeError:
+            return api_error('Некорректный cursor')
+
+        page = values[:limit]
+        games = [storage.get_game(value[-1]) for value in page]
+        return jsonify({
+            'kind': kind,
+            'category': category,
+            'games': [project_game(game, fields) for game in games if game],
+            'next_cursor': encode_cursor(list(page[-1])) if len(values) > limit else None
+        })
+
+    return catalog_response(build)
+
+
+@views.route('/api/search')
+def api_search():
+    """Поиск игр: ?q=, ?limit=, ?fields=; последнее слово запроса ищется по началу"""
+    query = request.args.get('q', '').strip()
+    try:
+        fields = parse_fields(request.args.get('fields'))
+        limit = parse_limit(request.args.get('limit'))
+    except PaginationError as e:
+        return api_error(str(e))
+
+    def build():
+        results = search_index.search(query, limit) if query else []
+        games = [storage.get_game(game_id) for _, game_id in results]
+        return jsonify({
+            'query': query,
+            'games': [project_game(game, fields) for game in games if game]
+        })
+
+    return catalog_response(build)
+
+
+@views.route('/api/search/suggest')
+def api_search_suggest():
+    """Подсказки при вводе в строку поиска"""
+    query = request.args.get('q', '')
+
+    def build():
+        suggestions = search_index.suggest(query) if query.strip() else []
+        return jsonify({
+            'query': query,
+            'suggestions': [{'id': game_id, 'title': title} for game_id, title in suggestions]
+        })
+
+    return catalog_response(build)
+
+
+@views.route('/api/games/changes')
+def api_game_changes():
+    """Игры, измененные после версии каталога ?since=, и id удаленных игр.
+
+    since=0 (или версия новее текущей, если данные пересоздали) - весь каталог, full=true.
+    """
+    try:
+        since = int(request.args.get('since', 0))
+        if since < 0:
+            raise ValueError
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError:
+        return api_error('since должен быть неотрицательным числом')
+    except PaginationError as e:
+        return api_error(str(e))
+
+    def build():
+        version, changed = storage.changes_since(since)
+        full = since == 0 or since > version
+        games, deleted = [], []
+        if full:
+            games = [project_game(game, fields) for game in storage.list_games()]
+        else:
+            for game_id, is_deleted in sorted(changed.items()):
+                game = None if is_deleted else storage.get_game(game_id)
+                if game:
+                    games.append(project_game(game, fields))
+                else:
+                    deleted.append(game_id)
+        return jsonify({'version': version, 'full': full, 'games': games, 'deleted': deleted})
+
+    return catalog_response(build)
+
+
+@views.route('/api/games/<int:game_id>')
+def api_game(game_id):
+    try:
+        fields = parse_fields(request.args.get('fields'))
+    except PaginationError as e:
+        return api_error(str(e))
+
+    def build():
+        game = storage.get_game(game_id)
+        if not game:
+            return api_error('Игра не найдена!', 404)
+        return jsonify(project_game(game, fields))
+
+    return catalog_response(build)
+
+
+@views.route('/api/games/<int:game_id>/comments')
+def api_game_comments(game_id):
+    """Комментарии игры по страницам в порядке добавления: ?limit=, ?cursor="""
+    def build():
+        game = storage.get_game(game_id)
+        if not game:
+            return api_error('Игра не найдена!', 404)
+
+        comments = sorted(game.get('comments', []), key=lambda comment: comment['id'])
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            page, next_cursor = paginate(comments, lambda comment: comment['id'],
+                                         request.args.get('cursor'), limit)
+        except PaginationError as e:
+            return api_error(str(e))
+
+        return jsonify({
+            'comments': page,
+            'total': len(comments),
+            'next_cursor': next_cursor
+        })
+
+    return catalog_response(build)
+
+
+@views.route('/api/jobs/<int:job_id>')
+def api_job(job_id):
+    """Состояние фоновой задачи: pending, running, done или failed"""
+    try:
+        job = jobs.status(job_id)
+    except Exception as e:
+        return api_error(f"Очередь задач недоступна: {e}", 503)
+    if not job or job['status'] == 'held':
+        return api_error('Задача не найдена', 404)
+    response = jsonify(job)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@views.route('/metrics')
+def metrics_endpoint():
+    """Метрики процесса в текстовом формате Prometheus"""
+    token = current_app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        return make_response('Forbidden\n', 403)
+    response = make_response(metrics.registry.render())
+    response.headers['Content-Type'] = metrics.CONTENT_TYPE
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 
 # Маршруты для статических файлов
-@app.route('/games/<path:filename>')
+@views.route('/games/<path:filename>')
 def serve_game(filename):
-    return send_from_directory('static/games', filename)
+    return assets.send(f"games/{filename}")
 
 
-@app.route('/images/<path:filename>')
+@views.route('/images/<path:filename>')
 def serve_image(filename):
-    return send_from_directory('static/images', filename)
+    return assets.send(f"images/{filename}")
 
 
-@app.route('/static/<path:filename>')
+@views.route('/static/<path:filename>')
 def serve_static(filename):
-    return send_from_directory('static', filename)
+    return assets.send(filename)
+
+
+@views.cli.command('jobs-worker')
+def jobs_worker_command():
+    """Выполняет фоновые задачи в этом процессе (для запуска рядом с JOB_WORKERS=0)"""
+    print(f"Исполнитель задач запущен: {jobs.db_path}")
+    try:
+        jobs.run_worker()
+    except KeyboardInterrupt:
+        pass
+    storage.flush()
+
+
+@views.cli.command('reprocess-games')
+@click.option('--all', 'all_games', is_flag=True, help='Пересобрать и игры с актуальной сборкой')
+@click.option('--inline', is_flag=True, help='Собрать сразу в этом процессе, а не через очередь')
+def reprocess_games_command(all_games, inline):
+    """Пересобирает оптимизированные версии игр из исходных HTML"""
+    count = 0
+    for game in storage.list_games():
+        build = game.get('build') or {}
+        if not all_games and build.get('version') == OPTIMIZER_VERSION:
+            continue
+        payload = {'game_id': game['id'], 'html_file': game['html_file'], 'cover_image': None}
+        if inline:
+            process_game(payload)
+        else:
+            jobs.enqueue('process_game', payload)
+        count += 1
+    print(f"{'Пересобрано' if inline else 'Поставлено в очередь'} игр: {count}")
+
+
+@views.cli.command('gc-blobs')
+def gc_blobs_command():
+    """Пересчитывает ссылки на файлы игр и удаляет файлы без ссылок"""
+    storage.flush()
+    removed = blob_store.gc(storage.list_games())
+    print(f"Удалено файлов без ссылок: {removed}")
+
+
+@views.cli.command('thumbnails')
+@click.option('--force', is_flag=True, help='Пересоздать миниатюры для всех игр')
+def thumbnails_command(force):
+    """Создает миниатюры обложек для игр, у которых их еще нет"""
+    created = 0
+    for game in storage.list_games():
+        if game.get('thumbnails') and not force:
+            continue
+        thumbnails = generate_thumbnails(STATIC_DIR, game['cover_image'])
+        if thumbnails and storage.update_game(game['id'], {'thumbnails': thumbnails}, touch=False):
+            changes_bus.publish('game', game['id'])
+            created += 1
+    print(f"Миниатюры созданы для {created} игр")
+
 
+@views.cli.command('precompress')
+def precompress_command():
+    """Создает сжатые копии (.gz, .br) для игр, стилей и скриптов"""
+    created = assets.precompress_tree(('games', BUILD_DIR, 'css', 'js'))
+    print(f"Создано сжатых копий: {created}")
 
-# Инициализация при запуске
-with app.app_context():
-    init_data()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,230 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import tempfile
+
+from flask import abort, request, send_file, url_for
+from werkzeug.security import safe_join
+
+from blobs import PRECOMPRESSED_SUFFIXES, is_blob_path
+from storage import file_signature, set_file_mode
+
+try:
+    import brotli
+except ImportError:  # brotli не установлен: отдаем только gzip
+    brotli = None
+
+# Заголовок для файлов, содержимое которых не меняется по этому адресу
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+
+# Остальные файлы браузер перепроверяет по ETag (ответ 304 без тела)
+REVALIDATE_CACHE = 'no-cache'
+
+# Сжатые копии в порядке предпочтения: (Content-Encoding, суффикс файла)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript',
+    'application/javascript', 'application/json', 'image/svg+xml',
+}
+
+# Файлы меньше этого размера не сжимаем: выигрыш меньше накладных расходов
+MIN_COMPRESS_SIZE = 1024
+
+# Файлы до этого размера без сжатых копий сжимаются прямо при первом запросе
+LAZY_COMPRESS_MAX = 256 * 1024
+
+# Длина отпечатка в параметре ?v=
+FINGERPRINT_LENGTH = 12
+
+
+def guess_mimetype(path):
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def is_compressible(path):
+    return guess_mimetype(path) in COMPRESSIBLE_TYPES
+
+
+class StaticAssets:
+    """Отдача файлов из static с долгим кэшированием и сжатыми копиями.
+
+    У каждого файла есть отпечаток - SHA-256 содержимого. Для файлов
+    из хранилища по хешу он уже записан в имени, для остальных считается
+    один раз и кэшируется до изменения файла. url() добавляет отпечаток
+    в адрес (?v=...), поэтому такие адреса кэшируются навсегда (immutable),
+    а при изменении файла меняется и адрес. Отпечаток же служит ETag,
+    и повторные запросы без ?v= получают 304.
+
+    Рядом с текстовыми файлами хранятся сжатые копии (<файл>.gz и, если
+    установлен brotli, <файл>.br); подходящая выбирается по Accept-Encoding.
+    routes - {папка: endpoint} для адресов вне /static.
+    """
+
+    def __init__(self, static_dir, routes=None, default_endpoint='serve_static'):
+        self.static_dir = static_dir
+        self.routes = routes or {}
+        self.default_endpoint = default_endpoint
+        self._fingerprints = {}
+        self._compress_attempts = set()
+
+    def fingerprint(self, path):
+        """SHA-256 содержимого файла или None, если файла нет"""
+        if is_blob_path(path):
+            return os.path.splitext(os.path.basename(path))[0]
+
+        full_path = os.path.join(self.static_dir, path)
+        signature = file_signature(full_path)
+        if signature is None:
+            return None
+        cached = self._fingerprints.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        hasher = hashlib.sha256()
+        with open(full_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b''):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        self._fingerprints[path] = (signature, digest)
+        return digest
+
+    def url(self, path):
+        """Адрес файла (путь относительно static) с отпечатком для кэширования"""
+        folder, _, rest = path.partition('/')
+        if folder in self.routes and rest:
+            endpoint, filename = self.routes[folder], rest
+        else:
+            endpoint, filename = self.default_endpoint, path
+
+        if is_blob_path(path):
+            # Имя файла уже и есть отпечаток
+            return url_for(endpoint, filename=filename)
+        try:
+            digest = self.fingerprint(path)
+        except OSError:
+            digest = None
+        if not digest:
+            return url_for(endpoint, filename=filename)
+        return url_for(endpoint, filename=filename, v=digest[:FINGERPRINT_LENGTH])
+
+    def send(self, path):
+        """Ответ с файлом для текущего запроса (path относительно static)"""
+        full_path = safe_join(self.static_dir, path)
+        if full_path is None or not os.path.isfile(full_path) or path.endswith(PRECOMPRESSED_SUFFIXES):
+            abort(404)
+
+        digest = self.fingerprint(path)
+        mimetype = guess_mimetype(path)
+        compressible = mimetype in COMPRESSIBLE_TYPES
+        encoding, suffix = self._negotiate(path, full_path) if compressible else (None, '')
+
+        # У каждой сжатой копии свой сильный ETag
+        etag = digest + (f'-{encoding}' if encoding else '')
+        response = send_file(full_path + suffix, mimetype=mimetype, etag=etag, conditional=True)
+
+        if is_blob_path(path) or request.args.get('v') == digest[:FINGERPRINT_LENGTH]:
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE
+        else:
+            response.headers['Cache-Control'] = REVALIDATE_CACHE
+        response.headers.pop('Expires', None)
+        if compressible:
+            response.vary.add('Accept-Encoding')
+        if encoding and response.status_code != 304:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    def _negotiate(self, path, full_path):
+        """Выбирает сжатую копию по Accept-Encoding, возвращает (encoding, суффикс)"""
+        accepted = request.accept_encodings
+        if not any(accepted[encoding] for encoding, _ in ENCODINGS):
+            return None, ''
+
+        source_mtime = os.path.getmtime(full_path)
+        # Небольшие файлы без копий сжимаем сразу, но пробуем один раз на версию файла
+        attempt = (path, source_mtime)
+        if (attempt not in self._compress_attempts and not self._has_fresh_variant(full_path, source_mtime)
+                and os.path.getsize(full_path) <= LAZY_COMPRESS_MAX):
+            self._compress_attempts.add(attempt)
+            self.precompress(path)
+
+        for encoding, suffix in ENCODINGS:
+            if accepted[encoding] and self._is_fresh(full_path + suffix, source_mtime):
+                return encoding, suffix
+        return None, ''
+
+    def _has_fresh_variant(self, full_path, source_mtime):
+        return any(self._is_fresh(full_path + suffix, source_mtime) for _, suffix in ENCODINGS)
+
+    @staticmethod
+    def _is_fresh(variant_path, source_mtime):
+        """Сжатая копия годится, только если она не старше исходного файла"""
+        try:
+            return os.path.getmtime(variant_path) >= source_mtime
+        except OSError:
+            return False
+
+    def precompress(self, path):
+        """Создает сжатые копии текстового файла, возвращает их число"""
+        full_path = os.path.join(self.static_dir, path)
+        if not is_compressible(path) or not os.path.isfile(full_path):
+            return 0
+        if os.path.getsize(full_path) < MIN_COMPRESS_SIZE:
+            return 0
+
+        with open(full_path, 'rb') as f:
+            data = f.read()
+
+        created = 0
+        for encoding, suffix in ENCODINGS:
+            if encoding == 'br':
+                if brotli is None:
+                    continue
+                compressed = brotli.compress(data, quality=11)
+            else:
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) >= len(data):
+                continue
+            self._write_variant(full_path + suffix, compressed)
+            created += 1
+        return created
+
+    @staticmethod
+    def _write_variant(variant_path, data):
+        directory = os.path.dirname(variant_path)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                set_file_mode(f.fileno())
+                f.write(data)
+            os.replace(tmp_path, variant_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def remove_variants(self, path):
+        """Удаляет сжатые копии файла"""
+        for _, suffix in ENCODINGS:
+            variant_path = os.path.join(self.static_dir, path + suffix)
+            try:
+                if os.path.exists(variant_path):
+                    os.remove(variant_path)
+            except OSError as e:
+                print(f"Ошибка удаления файла {variant_path}: {e}")
+
+    def precompress_tree(self, folders):
+        """Создает сжатые копии для всех текстовых файлов в папках static"""
+        created = 0
+        for folder in folders:
+            directory = os.path.join(self.static_dir, folder)
+            if not os.path.isdir(directory):
+                continue
+            for name in sorted(os.listdir(directory)):
+                if name.startswith('.') or not os.path.isfile(os.path.join(directory, name)):
+                    continue
+                created += self.precompress(f"{folder}/{name}")
+        return created
@@ -0,0 +1,59 @@
+import os
+import threading
+import weakref
+
+# Все созданные BackgroundThreads: после fork их нужно запустить заново
+_registry = weakref.WeakSet()
+
+
+class BackgroundThreads:
+    """Фоновые потоки-демоны, которые запускаются при первой надобности (ensure).
+
+    После fork в дочернем процессе остается только поток, вызвавший fork,
+    а потоки родителя (сброс счетчиков, сжатие журнала, задачи...) там не
+    существуют. Обработчик os.register_at_fork помечает все BackgroundThreads
+    незапущенными, и следующий ensure() запускает потоки уже в воркере.
+    Функции из on_fork вызываются в дочернем процессе там же: ими владелец
+    сбрасывает состояние, которое принадлежало потокам родителя.
+    """
+
+    def __init__(self, target, name, count=1):
+        self.target = target
+        self.name = name
+        self.count = count
+        self.on_fork = []
+        self._threads = []
+        self._lock = threading.Lock()
+        _registry.add(self)
+
+    def ensure(self):
+        """Запускает потоки, если в этом процессе их еще нет; True - если запустил"""
+        if self._threads:
+            return False
+        with self._lock:
+            if self._threads:
+                return False
+            names = [self.name] if self.count == 1 else [f"{self.name}-{number}" for number in range(self.count)]
+            self._threads = [threading.Thread(target=self.target, name=name, daemon=True) for name in names]
+            for thread in self._threads:
+                thread.start()
+            return True
+
+    def _after_fork(self):
+        # Блокировку мог держать поток родителя, которого в этом процессе нет
+        self._lock = threading.Lock()
+        self._threads = []
+        for callback in self.on_fork:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Ошибка сброса {self.name} после fork: {e}")
+
+
+def _after_fork_in_child():
+    for threads in list(_registry):
+        threads._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):  # на Windows fork нет
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,13 @@
+"""Нагрузочные тесты платформы на синтетическом каталоге.
+
+Запуск из папки game_platform:
+
+    python -m bench generate /tmp/bench-data --games 10000 --comments 1000000
+    python -m bench run --games 10000 --comments 100000 --output results.json
+    python -m bench compare old.json new.json
+
+run создает данные (или берет готовые через --data-dir), подключает
+к ним приложение и прогоняет сценарии через тестовый клиент Flask.
+Результат - задержки p50/p95/p99, пропускная способность и пиковая
+память процесса, сохраняются в JSON для сравнения между коммитами.
+"""
@@ -0,0 +1,171 @@
+import argparse
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from bench.generate import generate
+from bench.runner import Runner, load_app, metadata, peak_rss_mb
+
+
+def add_dataset_arguments(parser):
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--comments', type=int, default=10000)
+    parser.add_argument('--likes', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def dataset_options(args):
+    return {'games': args.games, 'users': args.users, 'comments': args.comments,
+            'likes': args.likes, 'seed': args.seed}
+
+
+def command_generate(args):
+    started = time.perf_counter()
+    dataset = generate(args.data_dir, **dataset_options(args))
+    print(f"Создано в {args.data_dir} за {time.perf_counter() - started:.1f} с: {dataset}")
+
+
+def command_run(args):
+    data_dir = args.data_dir
+    if data_dir:
+        with open(os.path.join(data_dir, 'games.json'), encoding='utf-8') as f:
+            games = json.load(f)
+        dataset = {'games': len(games), 'comments': sum(len(g.get('comments', [])) for g in games),
+                   'data_dir': data_dir}
+        with open(os.path.join(data_dir, 'users.json'), encoding='utf-8') as f:
+            dataset['users'] = len(json.load(f))
+        del games
+    else:
+        data_dir = tempfile.mkdtemp(prefix='gameform-bench-')
+        # Регистрируется раньше сброса счетчиков приложения, поэтому выполнится после него
+        atexit.register(shutil.rmtree, data_dir, ignore_errors=True)
+        print(f"Генерация данных в {data_dir}...")
+        dataset = generate(data_dir, **dataset_options(args))
+
+    config = {'PAGE_CACHE_TTL': args.page_cache_ttl, 'COUNTER_FLUSH_INTERVAL': args.flush_interval,
+              'PRELOAD': args.preload}
+    started = time.perf_counter()
+    app_module, app = load_app(data_dir, args.backend, config)
+    startup_s = time.perf_counter() - started
+
+    runner = Runner(app_module, app, dataset, requests=args.requests, warmup=args.warmup,
+                    concurrency=args.concurrency, seed=args.seed)
+    print(f"Сценарии ({args.requests} запросов каждый):")
+    scenarios = runner.run(only=args.scenario)
+
+    started = time.perf_counter()
+    app_module.storage.flush()
+    flush_ms = (time.perf_counter() - started) * 1000
+
+    report = {
+        'meta': metadata(dataset, {
+            'backend': args.backend,
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'concurrency': args.concurrency,
+            'page_cache_ttl': args.page_cache_ttl,
+            'preload': args.preload
+        }),
+        'startup_s': round(startup_s, 3),
+        'flush_ms': round(flush_ms, 3),
+        'peak_rss_mb': peak_rss_mb(),
+        'scenarios': scenarios
+    }
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {args.output}")
+
+
+def flatten(scenarios):
+    """{имя: сводка}, параллельные писатели - как concurrent_writers.<сценарий>"""
+    rows = {}
+    for name, result in scenarios.items():
+        if name == 'concurrent_writers':
+            for sub_name, sub_result in result.items():
+                if isinstance(sub_result, dict):
+                    rows[f'{name}.{sub_name}'] = sub_result
+        else:
+            rows[name] = result
+    return rows
+
+
+def print_report(report):
+    print(f"{'сценарий':<34}{'p50 мс':>10}{'p95 мс':>10}{'p99 мс':>10}{'запр/с':>10}{'ошибки':>8}")
+    for name, row in flatten(report['scenarios']).items():
+        print(f"{name:<34}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}"
+              f"{row['throughput_rps']:>10}{row['errors']:>8}")
+    print(f"Запуск: {report['startup_s']} с, сброс счетчиков: {report['flush_ms']} мс, "
+          f"пиковая память: {report['peak_rss_mb']} МБ")
+
+
+def command_compare(args):
+    with open(args.old, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+    print(f"{old['meta'].get('commit')} -> {new['meta'].get('commit')}")
+    old_rows, new_rows = flatten(old['scenarios']), flatten(new['scenarios'])
+    regressions = []
+    for name, row in new_rows.items():
+        before = old_rows.get(name)
+        if not before:
+            continue
+        changes = []
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if before[metric] and row[metric] is not None:
+                change = row[metric] / before[metric] - 1
+                changes.append(f"{metric[:3]} {before[metric]} -> {row[metric]} ({change:+.0%})")
+                if metric == args.metric and change > args.threshold:
+                    regressions.append(name)
+        print(f"{name:<34}" + '  '.join(changes))
+    if old.get('peak_rss_mb') and new.get('peak_rss_mb'):
+        print(f"Пиковая память: {old['peak_rss_mb']} -> {new['peak_rss_mb']} МБ")
+    if regressions:
+        print(f"Замедлились ({args.metric} больше чем на {args.threshold:.0%}): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description='Нагрузочные тесты платформы')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parser_generate = commands.add_parser('generate', help='Создать синтетический каталог')
+    parser_generate.add_argument('data_dir')
+    add_dataset_arguments(parser_generate)
+    parser_generate.set_defaults(handler=command_generate)
+
+    parser_run = commands.add_parser('run', help='Прогнать сценарии')
+    parser_run.add_argument('--data-dir', help='Готовые данные (иначе создаются во временной папке)')
+    add_dataset_arguments(parser_run)
+    parser_run.add_argument('--backend', choices=('json', 'sqlite'), default='json')
+    parser_run.add_argument('--requests', type=int, default=500)
+    parser_run.add_argument('--warmup', type=int, default=20)
+    parser_run.add_argument('--concurrency', type=int, default=4, help='Потоков-писателей (1 - без них)')
+    parser_run.add_argument('--page-cache-ttl', type=float, default=30)
+    parser_run.add_argument('--flush-interval', type=float, default=5)
+    parser_run.add_argument('--preload', action='store_true', help='Прочитать каталог при запуске (PRELOAD)')
+    parser_run.add_argument('--scenario', action='append', help='Только эти сценарии (можно несколько раз)')
+    parser_run.add_argument('--output', help='Файл для результатов в JSON')
+    parser_run.set_defaults(handler=command_run)
+
+    parser_compare = commands.add_parser('compare', help='Сравнить два файла результатов')
+    parser_compare.add_argument('old')
+    parser_compare.add_argument('new')
+    parser_compare.add_argument('--metric', choices=('p50_ms', 'p95_ms', 'p99_ms'), default='p95_ms')
+    parser_compare.add_argument('--threshold', type=float, default=0.2,
+                                help='Доля роста задержки, с которой сценарий считается замедлившимся')
+    parser_compare.set_defaults(handler=command_compare)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import os
+import random
+from datetime import datetime, timedelta
+
+from storage import save_json
+
+# Категории как в app.CATEGORIES (приложение при генерации не импортируем)
+CATEGORIES = [
+    'Аркады', 'Головоломки', 'Стратегии', 'Экшен', 'Приключения', 'Гонки', 'Спортивные',
+    'Симуляторы', 'Хоррор', 'РПГ', 'Казуальные', 'Образовательные', 'Другие'
+]
+
+WORDS = [
+    'гонка', 'космос', 'ферма', 'лабиринт', 'битва', 'пазл', 'танки', 'зомби', 'замок',
+    'дракон', 'шахматы', 'футбол', 'город', 'остров', 'пираты', 'робот', 'ниндзя', 'магия',
+    'race', 'space', 'puzzle', 'tower', 'defense', 'quest', 'hero', 'snake', 'block', 'jump'
+]
+
+# Файл игры из репозитория: play_game проверяет, что файл существует
+DEFAULT_HTML_FILE = 'games/test_game.html'
+
+# Пароль всех синтетических пользователей
+PASSWORD = 'bench'
+
+
+def skewed_index(rng, count, skew=2.0):
+    """Индекс от 0 до count-1, первые чаще: популярных игр меньше, чем остальных"""
+    return min(int(count * rng.random() ** skew), count - 1)
+
+
+def generate(data_dir, games=1000, users=100, comments=10000, likes=20000,
+             seed=1, html_file=DEFAULT_HTML_FILE):
+    """Создает в data_dir users.json, games.json и likes.json заданного размера.
+
+    Одинаковые параметры и seed дают одинаковые файлы, чтобы результаты
+    разных коммитов можно было сравнивать.
+    """
+    rng = random.Random(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    start = datetime(2025, 1, 1)
+
+    user_records = [{
+        'id': user_id,
+        'username': f'user{user_id}',
+        'password': PASSWORD,
+        'created_at': (start + timedelta(minutes=user_id)).isoformat(),
+        'last_login': (start + timedelta(minutes=user_id)).isoformat()
+    } for user_id in range(1, users + 1)]
+
+    game_records = []
+    for game_id in range(1, games + 1):
+        creator = rng.choice(user_records)
+        created_at = (start + timedelta(seconds=game_id * 600)).isoformat()
+        game_records.append({
+            'id': game_id,
+            'title': ' '.join(rng.sample(WORDS, 2)),
+            'creator': creator['username'],
+            'creator_id': creator['id'],
+            'description': ' '.join(rng.choices(WORDS, k=8)),
+            'category': rng.choice(CATEGORIES),
+            'html_file': html_file,
+            'cover_image': f'images/bench_{game_id}.png',
+            'likes': 0,
+            'plays': int(rng.paretovariate(1.2)) - 1,
+            'created_at': created_at,
+            'updated_at': created_at,
+            'comments': []
+        })
+
+    for comment_id in range(1, comments + 1):
+        game = game_records[skewed_index(rng, games)]
+        user = user_records[skewed_index(rng, users, 1.0)]
+        game['comments'].append({
+            'id': len(game['comments']) + 1,
+            'user': user['username'],
+            'user_id': user['id'],
+            'text': ' '.join(rng.choices(WORDS, k=6)),
+            'timestamp': game['created_at']
+        })
+
+    liked = {}
+    for _ in range(min(likes, games * users)):
+        game_id = game_records[skewed_index(rng, games)]['id']
+        liked.setdefault(game_id, set()).add(rng.randint(1, users))
+    for game in game_records:
+        game['likes'] = len(liked.get(game['id'], ()))
+    like_records = [{'game_id': game_id, 'user_ids': sorted(user_ids)}
+                    for game_id, user_ids in sorted(liked.items())]
+
+    for name, data in (('users.json', user_records), ('games.json', game_records),
+                       ('likes.json', like_records)):
+        if not save_json(os.path.join(data_dir, name), data):
+            raise OSError(f'Не удалось записать {name} в {data_dir}')
+    return {
+        'games': games,
+        'users': users,
+        'comments': comments,
+        'likes': sum(game['likes'] for game in game_records),
+        'seed': seed
+    }
@@ -0,0 +1,195 @@
+import importlib
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from bench.scenarios import build_scenarios
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль по ближайшему рангу (sorted_values отсортированы по возрастанию)"""
+    if not sorted_values:
+        return None
+    rank = max(int(len(sorted_values) * fraction + 0.999999) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def peak_rss_mb():
+    """Пиковая память процесса (МБ) или None, если ее не узнать"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдает килобайты, macOS - байты
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+
+def summarize(latencies, errors, elapsed):
+    """Сводка по задержкам (секунды) одного сценария"""
+    values = sorted(latencies)
+    result = {
+        'requests': len(values),
+        'errors': errors,
+        'throughput_rps': round(len(values) / elapsed, 1) if elapsed > 0 else None
+    }
+    for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+        value = percentile(values, fraction)
+        result[f'{name}_ms'] = round(value * 1000, 3) if value is not None else None
+    result['mean_ms'] = round(sum(values) / len(values) * 1000, 3) if values else None
+    result['max_ms'] = round(values[-1] * 1000, 3) if values else None
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_app(data_dir, backend='json', config=None):
+    """Создает приложение, работающее с data_dir; возвращает (модуль app, приложение)"""
+    db_path = os.path.join(data_dir, 'gameform.db')
+    if backend == 'sqlite':
+        import sqlite_storage
+        if not os.path.exists(db_path):
+            sqlite_storage.import_json(db_path, os.path.join(data_dir, 'users.json'),
+                                       os.path.join(data_dir, 'games.json'))
+    app_module = importlib.import_module('app')
+    flask_app = app_module.create_app(dict(config or {}, DATA_DIR=os.path.abspath(data_dir), STORAGE_BACKEND=backend,
+                                           SQLITE_PATH=os.path.abspath(db_path)))
+    return app_module, flask_app
+
+
+def login(client, user_id):
+    with client.session_transaction() as session:
+        session['username'] = f'user{user_id}'
+        session['user_id'] = user_id
+
+
+class Runner:
+    """Прогоняет сценарии на уже загруженном приложении"""
+
+    def __init__(self, app_module, app, context, requests=500, warmup=20, concurrency=4, seed=1):
+        self.app_module = app_module
+        self.app = app
+        self.context = context
+        self.requests = requests
+        self.warmup = warmup
+        self.concurrency = concurrency
+        self.seed = seed
+
+    def client(self, user_id):
+        client = self.app.test_client()
+        login(client, user_id)
+        return client
+
+    def _call(self, scenario, client, rng):
+        if scenario.before:
+            scenario.before(self.app_module)
+        started = time.perf_counter()
+        response = scenario.request(client, rng)
+        elapsed = time.perf_counter() - started
+        ok = scenario.ok(response)
+        response.close()
+        return elapsed, ok
+
+    def run_serial(self, scenario):
+        rng = random.Random(self.seed)
+        client = self.client(1)
+        first, _ = self._call(scenario, client, rng)
+        for _ in range(self.warmup):
+            self._call(scenario, client, rng)
+
+        latencies = []
+        errors = 0
+        started = time.perf_counter()
+        for _ in range(self.requests):
+            elapsed, ok = self._call(scenario, client, rng)
+            latencies.append(elapsed)
+            errors += not ok
+        result = summarize(latencies, errors, time.perf_counter() - started)
+        result['first_ms'] = round(first * 1000, 3)
+        return result
+
+    def run_concurrent(self, scenarios):
+        """Параллельные писатели: каждый поток - свой клиент и пользователь,
+        сценарии чередуются. Задержки собираются по всем потокам вместе."""
+        users = self.context['users']
+        latencies = {scenario.name: [] for scenario in scenarios}
+        errors = {scenario.name: 0 for scenario in scenarios}
+        lock = threading.Lock()
+        per_thread = max(self.requests // self.concurrency, 1)
+        barrier = threading.Barrier(self.concurrency + 1)
+
+        def worker(number):
+            rng = random.Random(self.seed + number)
+            client = self.client(number % users + 1)
+            local = {scenario.name: [] for scenario in scenarios}
+            local_errors = dict.fromkeys(local, 0)
+            barrier.wait()
+            for i in range(per_thread):
+                scenario = scenarios[i % len(scenarios)]
+                elapsed, ok = self._call(scenario, client, rng)
+                local[scenario.name].append(elapsed)
+                local_errors[scenario.name] += not ok
+            with lock:
+                for name, values in local.items():
+                    latencies[name].extend(values)
+                    errors[name] += local_errors[name]
+
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        result = {'threads': self.concurrency, 'elapsed_s': round(elapsed, 3)}
+        all_latencies = [value for values in latencies.values() for value in values]
+        result['total'] = summarize(all_latencies, sum(errors.values()), elapsed)
+        for name, values in latencies.items():
+            result[name] = summarize(values, errors[name], elapsed)
+        return result
+
+    def run(self, only=None, log=print):
+        """{сценарий: сводка}; параллельные писатели - под ключом concurrent_writers"""
+        scenarios = build_scenarios(self.context)
+        if only:
+            scenarios = [scenario for scenario in scenarios if scenario.name in only]
+        results = {}
+        for scenario in scenarios:
+            log(f"  {scenario.name}...")
+            results[scenario.name] = self.run_serial(scenario)
+            results[scenario.name]['peak_rss_mb'] = peak_rss_mb()
+
+        writers = [scenario for scenario in scenarios if scenario.writer]
+        if writers and self.concurrency > 1:
+            log(f"  concurrent_writers ({self.concurrency} потоков)...")
+            results['concurrent_writers'] = self.run_concurrent(writers)
+        return results
+
+
+def metadata(dataset, options):
+    return {
+        'created_at': datetime.now().isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'dataset': dataset,
+        'options': options
+    }
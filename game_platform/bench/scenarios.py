@@ -0,0 +1,95 @@
+from bench.generate import CATEGORIES, WORDS, skewed_index
+
+# Сортировки главной страницы и /api/games
+SORTS = ('likes', 'plays', 'newest', 'trending')
+API_SORTS = ('likes', 'plays', 'newest', 'title')
+
+
+class Scenario:
+    """Сценарий нагрузки: request(client, rng) делает один запрос и возвращает ответ.
+
+    writer - сценарий меняет данные (его же гоняют параллельно в несколько потоков).
+    before(app_module) вызывается перед каждым запросом и в замер не входит.
+    ok(response) решает, считать ли ответ успешным.
+    """
+
+    def __init__(self, name, request, writer=False, before=None, ok=None):
+        self.name = name
+        self.request = request
+        self.writer = writer
+        self.before = before
+        self.ok = ok or (lambda response: response.status_code < 400)
+
+
+def random_game(rng, context):
+    return skewed_index(rng, context['games']) + 1
+
+
+def like_ok(response):
+    return response.status_code == 200 and response.get_json().get('success')
+
+
+def play_ok(response):
+    # Если файла игры нет, play_game перенаправляет на главную
+    return response.status_code == 200
+
+
+def invalidate_pages(app_module):
+    app_module.page_cache.invalidate()
+
+
+def build_scenarios(context):
+    """Сценарии для каталога из context (число игр и т.п., см. generate())"""
+
+    def index(client, rng):
+        return client.get('/')
+
+    def index_filtered(client, rng):
+        return client.get('/', query_string={'category': rng.choice(CATEGORIES), 'sort': rng.choice(SORTS)})
+
+    def play_game(client, rng):
+        return client.get(f'/play/{random_game(rng, context)}')
+
+    def like_game(client, rng):
+        return client.get(f'/like/{random_game(rng, context)}')
+
+    def api_games(client, rng):
+        return client.get('/api/games', query_string={'sort': rng.choice(API_SORTS), 'limit': 20})
+
+    cursor = {}
+
+    def api_games_walk(client, rng):
+        # Листает каталог по курсору от начала до конца и заново
+        query = {'limit': 100}
+        if cursor.get('next'):
+            query['cursor'] = cursor['next']
+        response = client.get('/api/games', query_string=query)
+        cursor['next'] = (response.get_json() or {}).get('next_cursor')
+        return response
+
+    def api_game(client, rng):
+        return client.get(f'/api/games/{random_game(rng, context)}')
+
+    def api_game_comments(client, rng):
+        return client.get(f'/api/games/{random_game(rng, context)}/comments')
+
+    def api_search(client, rng):
+        return client.get('/api/search', query_string={'q': rng.choice(WORDS)})
+
+    def api_search_suggest(client, rng):
+        word = rng.choice(WORDS)
+        return client.get('/api/search/suggest', query_string={'q': word[:rng.randint(2, len(word))]})
+
+    return [
+        Scenario('index', index),
+        Scenario('index_uncached', index, before=invalidate_pages),
+        Scenario('index_filtered', index_filtered),
+        Scenario('api_games', api_games),
+        Scenario('api_games_walk', api_games_walk),
+        Scenario('api_game', api_game),
+        Scenario('api_game_comments', api_game_comments),
+        Scenario('api_search', api_search),
+        Scenario('api_search_suggest', api_search_suggest),
+        Scenario('play_game', play_game, writer=True, ok=play_ok),
+        Scenario('like_game', like_game, writer=True, ok=like_ok),
+    ]
@@ -0,0 +1,151 @@
+import os
+import re
+import time
+
+from storage import IndexedRepository
+
+# Имена файлов в хранилище по содержимому: <sha256>.<расширение>
+BLOB_NAME = re.compile(r'^[0-9a-f]{64}(\.[A-Za-z0-9]+)?$')
+
+# Папки внутри static, в которых лежат файлы игр и обложки
+BLOB_DIRS = ('games', 'images')
+
+# Папки с производными файлами (миниатюры, сборки игр), которые нужны, пока на них ссылается игра
+DERIVED_DIRS = ('images/thumbs', 'games/build')
+
+# Суффиксы сжатых копий, которые лежат рядом с исходными файлами (см. assets.py)
+PRECOMPRESSED_SUFFIXES = ('.br', '.gz')
+
+
+def is_blob_path(path):
+    """Путь вида games/<sha256>.html или images/<sha256>.png"""
+    return bool(BLOB_NAME.match(os.path.basename(path or '')))
+
+
+class BlobStore:
+    """Учет ссылок на файлы игр, обложек и сборок в static.
+
+    Файлы, загруженные через ingest_upload без имени, называются по SHA-256
+    содержимого, поэтому одинаковые загрузки хранятся один раз, а содержимое
+    файла по имени никогда не меняется. Для каждого пути хранится число игр,
+    которые на него ссылаются (data/blobs.json). Когда ссылок не остается,
+    файл удаляется; gc() пересчитывает ссылки по записям игр и убирает сирот.
+    Функции из on_remove вызываются с путем удаленного файла (например,
+    чтобы удалить миниатюры обложки).
+    """
+
+    def __init__(self, static_dir, refs_file, grace_period=3600):
+        self.static_dir = static_dir
+        self.refs = IndexedRepository(refs_file, unique=('path',))
+        self.grace_period = grace_period
+        self.on_remove = []
+
+    def acquire(self, path):
+        """Добавляет ссылку на файл"""
+        with self.refs.transaction():
+            record = self.refs.get('path', path)
+            if record:
+                record['refs'] += 1
+            else:
+                self.refs.add({'path': path, 'refs': 1})
+            return self.refs.save()
+
+    def add(self, source, path):
+        """Кладет загруженный файл source в static/path и добавляет ссылку на него.
+
+        Если такой файл уже есть, source удаляется. Проверка и новая ссылка
+        делаются под той же блокировкой, что и release(): иначе между ними
+        release() мог бы удалить последнюю ссылку вместе с файлом.
+        """
+        full_path = os.path.join(self.static_dir, path)
+        with self.refs.transaction():
+            if os.path.exists(full_path):
+                os.remove(source)
+                os.utime(full_path)  # свежий mtime защищает файл от gc() до записи ссылки в игру
+            else:
+                os.replace(source, full_path)
+            return self.acquire(path)
+
+    def release(self, path):
+        """Убирает ссылку на файл и удаляет его, если ссылок больше нет"""
+        with self.refs.transaction():
+            record = self.refs.get('path', path)
+            if record:
+                record['refs'] -= 1
+                if record['refs'] > 0:
+                    return self.refs.save()
+                self.refs.remove(record)
+                if not self.refs.save():
+                    return False
+                self._remove(path)
+            elif not is_blob_path(path):
+                # Старые файлы (до учета ссылок) принадлежали одной игре и удаляются сразу
+                self._remove(path)
+            return True
+
+    def _remove(self, path):
+        full_path = os.path.join(self.static_dir, path)
+        try:
+            if os.path.exists(full_path):
+                os.remove(full_path)
+        except OSError as e:
+            print(f"Ошибка удаления файла {full_path}: {e}")
+        for callback in self.on_remove:
+            callback(path)
+
+    def gc(self, games):
+        """Пересчитывает ссылки по записям игр и удаляет файлы без ссылок.
+
+        Свежие файлы (моложе grace_period) не трогаются: их могли только что
+        загрузить, но еще не успели записать ссылку. Возвращает число удаленных файлов.
+        """
+        counts = {}
+        derived = set()
+        for game in games:
+            for path in (game.get('html_file'), game.get('cover_image')):
+                if path:
+                    counts[path] = counts.get(path, 0) + 1
+            for variants in (game.get('thumbnails') or {}).values():
+                derived.update(variants.values())
+            build = game.get('build') or {}
+            for path in build.get('assets', []) + ([build['html']] if build.get('html') else []):
+                # Сборки общие для игр с одинаковым HTML, поэтому на них тоже считаются ссылки
+                counts[path] = counts.get(path, 0) + 1
+                derived.add(path)
+
+        removed = 0
+        now = time.time()
+        with self.refs.transaction():
+            self.refs.save([{'path': path, 'refs': refs} for path, refs in sorted(counts.items())])
+
+            for folder in BLOB_DIRS + DERIVED_DIRS:
+                directory = os.path.join(self.static_dir, folder)
+                if not os.path.isdir(directory):
+                    continue
+                for name in os.listdir(directory):
+                    full_path = os.path.join(directory, name)
+                    if not os.path.isfile(full_path):
+                        continue
+                    path = f"{folder}/{name}"
+                    # Сжатая копия живет, пока нужен ее исходный файл
+                    source_name = name
+                    for suffix in PRECOMPRESSED_SUFFIXES:
+                        if name.endswith(suffix):
+                            source_name = name[:-len(suffix)]
+                    source_path = f"{folder}/{source_name}"
+                    if folder in DERIVED_DIRS:
+                        orphan_blob = source_path not in derived
+                    else:
+                        orphan_blob = BLOB_NAME.match(source_name) and source_path not in counts
+                    orphan_variant = source_name != name and not os.path.exists(os.path.join(directory, source_name))
+                    stale_upload = name.startswith('.upload-')
+                    if not (orphan_blob or orphan_variant or stale_upload):
+                        continue
+                    try:
+                        if now - os.path.getmtime(full_path) < self.grace_period:
+                            continue
+                        os.remove(full_path)
+                        removed += 1
+                    except OSError as e:
+                        print(f"Ошибка удаления файла {full_path}: {e}")
+        return removed
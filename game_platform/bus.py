@@ -0,0 +1,132 @@
+import os
+import socket
+import threading
+
+from eventlog import EventLog
+from metrics import counter
+from storage import file_lock
+
+BUS_MESSAGES = counter('gameform_change_bus_messages_total', 'Уведомления об изменениях', ('direction', 'entity'))
+
+# Сущность "все": получатель сбрасывает все кэши (часть уведомлений могла потеряться)
+ALL = '*'
+
+
+class ChangeBus:
+    """Канал уведомлений об изменениях данных (game, user...) внутри процесса.
+
+    Маршруты после записи в хранилище вызывают publish(сущность, id),
+    а кэши процесса подписываются через subscribe(callback) и получают
+    callback(сущность, id). Уведомление не несет самих данных: получатель
+    сбрасывает или перечитывает свою копию. Реализации для нескольких
+    процессов (FileChangeBus) доставляют и чужие уведомления в poll().
+    """
+
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+        return callback
+
+    def publish(self, entity, entity_id=None, local=True, remote=True):
+        """Сообщает об изменении сущности (id=None - всех сущностей этого типа).
+
+        local - подписчикам этого процесса, remote - другим процессам
+        (если изменение им пока не видно, например лежит в буфере процесса,
+        remote=False).
+        """
+        BUS_MESSAGES.inc(direction='published', entity=entity)
+        if local:
+            self._deliver(entity, entity_id)
+        if remote:
+            self._send(entity, entity_id)
+
+    def _send(self, entity, entity_id):
+        pass
+
+    def poll(self):
+        """Доставляет уведомления других процессов, возвращает их число"""
+        return 0
+
+    def _deliver(self, entity, entity_id):
+        for callback in self._subscribers:
+            try:
+                callback(entity, entity_id)
+            except Exception as e:
+                print(f"Ошибка обработки изменения {entity} {entity_id}: {e}")
+
+
+class FileChangeBus(ChangeBus):
+    """Уведомления между процессами через общий журнал (JSONL).
+
+    publish() доставляет уведомление в своем процессе и дописывает строку
+    {"origin": процесс, "entity": ..., "id": ...} в журнал; poll() каждого
+    процесса дочитывает новый хвост (обычно это один stat) и доставляет
+    чужие строки. Подходит для воркеров на одной машине и для нескольких
+    машин с общей папкой данных. Журнал заменяется пустым, когда вырастает
+    больше max_bytes; читатель, заметивший замену, получает уведомление ALL,
+    потому что часть строк могла пройти мимо него. Запись и замена идут
+    под блокировкой файла (file_lock), как у журналов хранилища.
+    """
+
+    def __init__(self, filename, max_bytes=1024 * 1024):
+        super().__init__()
+        self.log = EventLog(filename)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._inode = None
+        self._offset = None  # None - еще не подключились: старые строки не читаем
+
+    def _origin(self):
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def _attach(self):
+        identity = self.log.identity()
+        self._inode, self._offset = identity if identity else (None, 0)
+
+    def _send(self, entity, entity_id):
+        message = {'origin': self._origin(), 'entity': entity, 'id': entity_id}
+        try:
+            # Журнал общий для процессов: дозапись и замена - под блокировкой файла
+            with self._lock, file_lock(self.log.filename):
+                if self._offset is None:
+                    self._attach()
+                # Уведомления не нужно переживать перезагрузку, поэтому без fsync
+                self.log.append([message], fsync=False)
+                identity = self.log.identity()
+                if identity and identity[1] > self.max_bytes:
+                    self.log.reset()
+        except OSError as e:
+            print(f"Ошибка записи уведомления в {self.log.filename}: {e}")
+
+    def poll(self):
+        with self._lock:
+            if self._offset is None:
+                self._attach()
+                return 0
+            identity = self.log.identity()
+            inode, size = identity if identity else (None, 0)
+            messages = []
+            if inode != self._inode or size < self._offset:
+                if self._inode is not None:
+                    # Журнал заменен: непрочитанный хвост старого файла потерян
+                    messages.append({'entity': ALL, 'id': None})
+                self._inode, self._offset = inode, 0
+            if size > self._offset:
+                entries, self._offset = self.log.read_from(self._offset)
+                origin = self._origin()
+                messages.extend(entry for entry in entries if entry.get('origin') != origin)
+        for message in messages:
+            BUS_MESSAGES.inc(direction='received', entity=message['entity'])
+            self._deliver(message['entity'], message.get('id'))
+        return len(messages)
+
+
+def create_bus(kind, filename):
+    """Создает канал kind: file (журнал filename, общий для процессов) или local (только этот процесс)"""
+    if kind == 'local':
+        return ChangeBus()
+    if kind == 'file':
+        return FileChangeBus(filename)
+    raise ValueError(f"Неизвестный канал уведомлений: {kind}")
@@ -0,0 +1,85 @@
+import threading
+
+from eventlog import EventLog
+
+
+class ChangeLog:
+    """Версия каталога игр и журнал изменений для JSON хранилища.
+
+    Каждое изменение игры дописывает в changes.jsonl строку
+    {"version": n, "game_id": id, "deleted": bool} со следующим номером
+    версии. Для ответа "что изменилось после версии v" достаточно последней
+    записи по каждой игре, поэтому при сжатии журнал переписывается
+    с одной строкой на игру (удаленные остаются как пометки), и версия
+    не уменьшается. Запись должна выполняться под блокировкой файла игр.
+    """
+
+    def __init__(self, filename, compact_entries=10000):
+        self.log = EventLog(filename)
+        self.compact_entries = compact_entries
+        self._lock = threading.RLock()
+        self._inode = None
+        self._offset = 0
+        self._entries = 0
+        self._version = 0
+        self._latest = {}  # game_id -> (версия, удалена ли игра)
+
+    def sync(self):
+        """Дочитывает новые записи журнала (в том числе других процессов)"""
+        with self._lock:
+            identity = self.log.identity()
+            inode = identity[0] if identity else None
+            if inode != self._inode:
+                # Журнал сжат или создан заново: читаем с начала
+                self._inode = inode
+                self._offset = 0
+                self._entries = 0
+                self._version = 0
+                self._latest = {}
+            if identity and identity[1] > self._offset:
+                entries, self._offset = self.log.read_from(self._offset)
+                for entry in entries:
+                    self._entries += 1
+                    self._version = max(self._version, entry['version'])
+                    self._latest[entry['game_id']] = (entry['version'], entry.get('deleted', False))
+
+    def version(self):
+        self.sync()
+        return self._version
+
+    def record(self, game_ids, deleted=False):
+        """Записывает изменение игр, возвращает новую версию каталога"""
+        game_ids = list(dict.fromkeys(game_ids))
+        if not game_ids:
+            return self.version()
+        with self._lock:
+            self.sync()
+            entries = [{'version': self._version + index, 'game_id': game_id, 'deleted': deleted}
+                       for index, game_id in enumerate(game_ids, 1)]
+            try:
+                self.log.append(entries)
+            except OSError as e:
+                print(f"Ошибка записи журнала изменений {self.log.filename}: {e}")
+                return self._version
+            self.sync()
+            if self._entries > max(self.compact_entries, 2 * len(self._latest)):
+                self.compact()
+            return self._version
+
+    def compact(self):
+        """Оставляет в журнале только последнюю запись по каждой игре"""
+        with self._lock:
+            self.sync()
+            entries = [{'version': version, 'game_id': game_id, 'deleted': deleted}
+                       for game_id, (version, deleted) in sorted(self._latest.items(), key=lambda x: x[1][0])]
+            try:
+                self.log.reset(entries)
+            except OSError as e:
+                print(f"Ошибка сжатия журнала изменений {self.log.filename}: {e}")
+
+    def changes_since(self, version):
+        """(текущая версия, {game_id: удалена ли игра}) для игр, измененных после version"""
+        with self._lock:
+            self.sync()
+            return self._version, {game_id: deleted for game_id, (changed, deleted) in self._latest.items()
+                                   if changed > version}
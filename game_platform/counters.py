@@ -0,0 +1,167 @@
+import atexit
+import os
+import threading
+
+from background import BackgroundThreads
+
+
+class BufferedCounters:
+    """Буферизует счетчики запусков и лайки поверх хранилища.
+
+    play_game и like_game только меняют словари в памяти, а фоновый поток
+    раз в interval секунд (или при накоплении threshold изменений) одним
+    вызовом apply_counters переносит их в хранилище. Чтение игр через этот
+    объект учитывает еще не сохраненные изменения, в том числе версия
+    каталога (catalog_tag) и журнал изменений. Остальные методы хранилища
+    вызываются напрямую.
+    """
+
+    def __init__(self, backend, interval=5.0, threshold=100):
+        self.backend = backend
+        self.interval = interval
+        self.threshold = threshold
+        self._plays = {}   # game_id -> прирост запусков
+        self._likes = {}   # game_id -> {user_id: True/False}
+        self._pending = 0
+        self._generation = 0  # номер последнего изменения в буфере, не сбрасывается
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._thread = BackgroundThreads(self._run, 'counter-flush')
+        self.on_flush = []  # callback(game_ids) после записи изменений в хранилище
+        atexit.register(self.flush)
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    # Чтение с учетом буфера
+
+    def _overlay(self, game):
+        game_id = game.get('id')
+        plays = self._plays.get(game_id)
+        likes = self._likes.get(game_id)
+        if not plays and not likes:
+            return game
+
+        game = dict(game)
+        if plays:
+            game['plays'] = game.get('plays', 0) + plays
+        if likes:
+            # Учитываем только лайки, которые отличаются от сохраненных
+            game['likes'] = game.get('likes', 0) + sum(
+                1 if liked else -1 for user_id, liked in likes.items()
+                if liked != self.backend.is_liked(game_id, user_id))
+        return game
+
+    def list_games(self):
+        with self._lock:
+            return [self._overlay(game) for game in self.backend.list_games()]
+
+    def get_game(self, game_id):
+        with self._lock:
+            game = self.backend.get_game(game_id)
+            return self._overlay(game) if game else None
+
+    def games_by_creator(self, creator_id):
+        with self._lock:
+            return [self._overlay(game) for game in self.backend.games_by_creator(creator_id)]
+
+    def is_liked(self, game_id, user_id):
+        with self._lock:
+            pending = self._likes.get(game_id, {})
+            if user_id in pending:
+                return pending[user_id]
+            return self.backend.is_liked(game_id, user_id)
+
+    def liked_game_ids(self, user_id):
+        with self._lock:
+            liked = set(self.backend.liked_game_ids(user_id))
+            for game_id, changes in self._likes.items():
+                if changes.get(user_id) is True:
+                    liked.add(game_id)
+                elif changes.get(user_id) is False:
+                    liked.discard(game_id)
+            return liked
+
+    def catalog_tag(self):
+        """Метка версии каталога для ETag с учетом буфера.
+
+        Версия хранилища растет только при сбросе, поэтому, пока в буфере
+        есть изменения, к ней добавляются процесс и номер последнего
+        изменения: ответы до и после лайка получают разные метки.
+        """
+        with self._lock:
+            version = self.backend.catalog_version()
+            if not self._plays and not self._likes:
+                return str(version)
+            return f"{version}-{os.getpid()}-{self._generation}"
+
+    def changes_since(self, version):
+        """Изменения хранилища после version и игры с несохраненными запусками и лайками"""
+        with self._lock:
+            current, changed = self.backend.changes_since(version)
+            for game_id in set(self._plays) | set(self._likes):
+                changed.setdefault(game_id, False)
+            return current, changed
+
+    # Буферизованные изменения
+
+    def increment_plays(self, game_id, amount=1):
+        with self._lock:
+            game = self.get_game(game_id)
+            if not game:
+                return None
+            self._plays[game_id] = self._plays.get(game_id, 0) + amount
+            self._touch()
+            return game.get('plays', 0) + amount
+
+    def toggle_like(self, game_id, user_id):
+        with self._lock:
+            game = self.get_game(game_id)
+            if not game:
+                return None
+            is_liked = not self.is_liked(game_id, user_id)
+            self._likes.setdefault(game_id, {})[user_id] = is_liked
+            self._touch()
+            return self.get_game(game_id)['likes'], is_liked
+
+    def delete_game(self, game_id):
+        with self._lock:
+            self._plays.pop(game_id, None)
+            self._likes.pop(game_id, None)
+            return self.backend.delete_game(game_id)
+
+    def _touch(self):
+        self._pending += 1
+        self._generation += 1
+        self._thread.ensure()
+        if self._pending >= self.threshold:
+            self._wake.set()
+
+    # Сброс в хранилище
+
+    def flush(self):
+        """Атомарно переносит накопленные изменения в хранилище"""
+        with self._lock:
+            if not self._plays and not self._likes:
+                return True
+            plays, likes = self._plays, self._likes
+            if not self.backend.apply_counters(plays, likes):
+                print("Ошибка сохранения счетчиков, повторим позже")
+                return False
+            self._plays, self._likes, self._pending = {}, {}, 0
+        game_ids = set(plays) | set(likes)
+        for callback in self.on_flush:
+            try:
+                callback(game_ids)
+            except Exception as e:
+                print(f"Ошибка обработки сброса счетчиков: {e}")
+        return True
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Ошибка сброса счетчиков: {e}")
@@ -0,0 +1,49 @@
+from flask.cli import AppGroup
+
+
+class DeferredSetup:
+    """Маршруты, обработчики и команды, объявленные при импорте модуля.
+
+    Декораторы повторяют методы Flask (route, before_request, template_global...),
+    но только запоминают функции; init_app(app) регистрирует их в приложении,
+    созданном фабрикой. В отличие от Blueprint, имена эндпоинтов не получают
+    префикса, поэтому url_for('index') и остальные ссылки не меняются.
+    """
+
+    def __init__(self):
+        self._setup = []
+        # Команды flask ...; оборачиваются в контекст приложения при вызове
+        self.cli = AppGroup('gameform')
+
+    def _defer(self, method, *args, **kwargs):
+        def decorator(function):
+            self._setup.append((method, args, kwargs, function))
+            return function
+        return decorator
+
+    def route(self, rule, **options):
+        return self._defer('route', rule, **options)
+
+    def template_global(self, name=None):
+        return self._defer('template_global', name)
+
+    def template_filter(self, name=None):
+        return self._defer('template_filter', name)
+
+    def before_request(self, function):
+        return self._defer('before_request')(function)
+
+    def after_request(self, function):
+        return self._defer('after_request')(function)
+
+    def teardown_request(self, function):
+        return self._defer('teardown_request')(function)
+
+    def init_app(self, app):
+        for method, args, kwargs, function in self._setup:
+            register = getattr(app, method)
+            if args or kwargs:
+                register = register(*args, **kwargs)
+            register(function)
+        for command in self.cli.commands.values():
+            app.cli.add_command(command)
@@ -0,0 +1,86 @@
+import json
+import os
+import time
+
+from metrics import counter, histogram
+
+APPEND_SECONDS = histogram('gameform_event_log_append_seconds', 'Дозапись в журнал (с fsync)', ('file',))
+READ_SECONDS = histogram('gameform_event_log_read_seconds', 'Чтение и разбор хвоста журнала', ('file',))
+BYTES_WRITTEN = counter('gameform_event_log_bytes_written_total', 'Байт дописано в журнал', ('file',))
+
+
+class EventLog:
+    """Журнал событий в формате JSONL, в который можно только дописывать.
+
+    Каждое событие - одна строка JSON. Читатели запоминают смещение в байтах
+    и при следующем чтении разбирают только новый хвост. После сжатия журнал
+    заменяется пустым файлом (новый inode), и читатели начинают с нуля.
+    Запись должна выполняться под блокировкой файла данных.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def identity(self):
+        """(inode, размер) журнала или None, если журнала еще нет"""
+        try:
+            stat = os.stat(self.filename)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_size
+
+    def append(self, events, fsync=True):
+        """Дописывает события одной записью, возвращает число записанных байт"""
+        data = ''.join(json.dumps(event, ensure_ascii=False) + '\n' for event in events).encode('utf-8')
+        if not data:
+            return 0
+        started = time.perf_counter()
+        os.makedirs(os.path.dirname(self.filename) or '.', exist_ok=True)
+        fd = os.open(self.filename, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            # Если предыдущая запись оборвалась на середине строки, начинаем с новой строки
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b'\n':
+                data = b'\n' + data
+            os.write(fd, data)
+            if fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        name = os.path.basename(self.filename)
+        APPEND_SECONDS.observe(time.perf_counter() - started, file=name)
+        BYTES_WRITTEN.inc(len(data), file=name)
+        return len(data)
+
+    def read_from(self, offset):
+        """Читает события после offset, возвращает (события, новое смещение).
+
+        Недописанная последняя строка не разбирается и будет прочитана позже.
+        """
+        started = time.perf_counter()
+        try:
+            with open(self.filename, 'rb') as f:
+                f.seek(offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return [], 0
+
+        end = chunk.rfind(b'\n') + 1
+        events = []
+        for line in chunk[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                print(f"Пропущена поврежденная строка журнала {self.filename}: {e}")
+        READ_SECONDS.observe(time.perf_counter() - started, file=os.path.basename(self.filename))
+        return events, offset + end
+
+    def reset(self, events=()):
+        """Атомарно заменяет журнал пустым файлом (или файлом только с events)"""
+        tmp_path = self.filename + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(''.join(json.dumps(event, ensure_ascii=False) + '\n' for event in events).encode('utf-8'))
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.filename)
@@ -0,0 +1,70 @@
+import glob
+import os
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow не установлен: карточки показывают исходные обложки
+    Image = None
+
+# Ширины уменьшенных копий для карточек (карточка ~400px, с запасом для HiDPI)
+THUMBNAIL_WIDTHS = (320, 480, 720)
+
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+THUMBS_DIR = 'images/thumbs'
+
+
+def thumbnail_stem(cover_path):
+    """Общая часть имен уменьшенных копий обложки"""
+    return os.path.splitext(os.path.basename(cover_path))[0]
+
+
+def generate_thumbnails(static_dir, cover_path):
+    """Создает уменьшенные копии обложки в форматах WebP и JPEG.
+
+    Возвращает {'webp': {'320': 'images/thumbs/<stem>_320.webp', ...}, 'jpeg': {...}}
+    или пустой словарь, если Pillow не установлен или файл не удалось открыть.
+    Копии шире исходного изображения не создаются.
+    """
+    if Image is None:
+        return {}
+
+    source = os.path.join(static_dir, cover_path)
+    stem = thumbnail_stem(cover_path)
+    os.makedirs(os.path.join(static_dir, THUMBS_DIR), exist_ok=True)
+
+    try:
+        with Image.open(source) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+            widths = [w for w in THUMBNAIL_WIDTHS if w < image.width] or [image.width]
+            variants = {}
+            for width in widths:
+                height = max(1, round(image.height * width / image.width))
+                resized = image.resize((width, height), Image.LANCZOS)
+                for fmt, (pil_format, options) in THUMBNAIL_FORMATS.items():
+                    picture = resized
+                    if pil_format == 'JPEG' and picture.mode != 'RGB':
+                        picture = picture.convert('RGB')
+                    path = f"{THUMBS_DIR}/{stem}_{width}.{fmt}"
+                    picture.save(os.path.join(static_dir, path), pil_format, **options)
+                    variants.setdefault(fmt, {})[str(width)] = path
+            return variants
+    except Exception as e:
+        print(f"Ошибка создания миниатюр для {cover_path}: {e}")
+        return {}
+
+
+def remove_thumbnails(static_dir, cover_path):
+    """Удаляет уменьшенные копии обложки"""
+    pattern = os.path.join(static_dir, THUMBS_DIR, f"{glob.escape(thumbnail_stem(cover_path))}_*")
+    for path in glob.glob(pattern):
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"Ошибка удаления миниатюры {path}: {e}")
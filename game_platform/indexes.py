@@ -0,0 +1,60 @@
+import threading
+
+
+class CatalogIndex:
+    """Основа для индексов по играм в памяти процесса (рейтинги, поиск).
+
+    Индекс строится при первом обращении и дальше обновляется по одной игре:
+    refresh() вызывают маршруты, которые меняют игры, а изменения других
+    процессов подтягиваются по журналу изменений хранилища (changes_since)
+    в sync(). Подклассы реализуют _clear() и _update(game_id, game),
+    где game=None означает, что игры больше нет.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._lock = threading.RLock()
+        self._ready = False
+        self._version = None
+
+    def _clear(self):
+        raise NotImplementedError
+
+    def _update(self, game_id, game):
+        raise NotImplementedError
+
+    def _build(self):
+        # Версию берем до чтения игр: изменения во время чтения применятся при следующем sync
+        self._version = self.storage.catalog_version()
+        self._clear()
+        for game in self.storage.list_games():
+            self._update(game['id'], game)
+        self._ready = True
+
+    def sync(self):
+        """Строит индекс при первом обращении и применяет чужие изменения"""
+        with self._lock:
+            if not self._ready:
+                self._build()
+                return
+            if self.storage.catalog_version() == self._version:
+                return
+            version, changed = self.storage.changes_since(self._version)
+            if version < self._version:
+                # Данные пересоздали: версия ушла назад
+                self._build()
+                return
+            for game_id, deleted in changed.items():
+                self._update(game_id, None if deleted else self.storage.get_game(game_id))
+            self._version = version
+
+    def invalidate(self):
+        """Перестраивает индекс при следующем обращении"""
+        with self._lock:
+            self._ready = False
+
+    def refresh(self, game_id):
+        """Перечитывает игру после изменения в этом процессе"""
+        with self._lock:
+            if self._ready:
+                self._update(game_id, self.storage.get_game(game_id))
@@ -0,0 +1,230 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+
+from background import BackgroundThreads
+from metrics import counter, histogram
+from storage import now_iso
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_after REAL NOT NULL,
+    locked_by TEXT,
+    locked_until REAL,
+    result TEXT,
+    error TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after);
+"""
+
+# Поля задачи, которые отдает status()
+JOB_FIELDS = ('id', 'kind', 'status', 'attempts', 'max_attempts', 'error', 'created_at', 'updated_at')
+
+JOB_SECONDS = histogram('gameform_job_seconds', 'Выполнение фоновой задачи', ('kind', 'outcome'))
+JOBS_FINISHED = counter('gameform_jobs_finished_total', 'Завершенные попытки фоновых задач', ('kind', 'outcome'))
+
+
+class JobQueue:
+    """Очередь фоновых задач в SQLite.
+
+    Задачу ставит enqueue(kind, payload), выполняет функция, объявленная
+    через handler(kind); ее результат (JSON) сохраняется вместе со статусом
+    pending -> running -> done или failed. Упавшая задача повторяется
+    с растущей паузой, пока не кончатся max_attempts попыток.
+    Задачу можно поставить придержанной (held): ее id известен сразу,
+    а выполняться она начнет после release() (или удалится cancel()).
+
+    Выполнять задачи может пул потоков в самом приложении (start())
+    и/или отдельный процесс (run_worker()): очередь общая, задачу берет
+    тот, кто первым захватит ее в транзакции. Захват действует lease секунд;
+    задачу упавшего процесса после этого берет другой исполнитель.
+    """
+
+    def __init__(self, db_path, workers=2, max_attempts=3, retry_delay=5.0, lease=300.0, poll_interval=1.0):
+        self.db_path = db_path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._handlers = {}
+        self._local = threading.local()
+        self._wake = threading.Condition()
+        self._threads = BackgroundThreads(self.run_worker, 'job-worker', count=workers)
+        self._schema_ready = False
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        # Соединение, открытое до fork, воркеру не годится
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if not self._schema_ready:
+                conn.executescript(SCHEMA)
+                self._schema_ready = True
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def handler(self, kind, on_failure=None):
+        """Декоратор: функция выполняет задачи kind и получает их payload.
+
+        on_failure(payload, error) вызывается, когда попытки кончились.
+        """
+        def register(function):
+            self._handlers[kind] = (function, on_failure)
+            return function
+        return register
+
+    # Постановка и статус
+
+    def enqueue(self, kind, payload, max_attempts=None, held=False):
+        """Ставит задачу в очередь, возвращает ее id"""
+        if kind not in self._handlers:
+            raise KeyError(kind)
+        now = now_iso()
+        cursor = self.connection().execute(
+            'INSERT INTO jobs (kind, payload, status, max_attempts, run_after, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (kind, json.dumps(payload, ensure_ascii=False), 'held' if held else 'pending',
+             max_attempts or self.max_attempts, time.time(), now, now))
+        if not held:
+            self._notify()
+        return cursor.lastrowid
+
+    def release(self, job_id, payload=None):
+        """Разрешает выполнять придержанную задачу (payload заменяет прежний, если задан)"""
+        self.connection().execute(
+            "UPDATE jobs SET status = 'pending', payload = COALESCE(?, payload), updated_at = ? "
+            "WHERE id = ? AND status = 'held'",
+            (json.dumps(payload, ensure_ascii=False) if payload is not None else None, now_iso(), job_id))
+        self._notify()
+
+    def cancel(self, job_id):
+        """Удаляет придержанную задачу"""
+        self.connection().execute("DELETE FROM jobs WHERE id = ? AND status = 'held'", (job_id,))
+
+    def _notify(self):
+        self.start()
+        with self._wake:
+            self._wake.notify()
+
+    def status(self, job_id):
+        """Состояние задачи (JOB_FIELDS + result) или None"""
+        row = self.connection().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = {field: row[field] for field in JOB_FIELDS}
+        job['result'] = json.loads(row['result']) if row['result'] else None
+        return job
+
+    def purge(self, max_age=7 * 24 * 3600):
+        """Удаляет завершенные (и брошенные придержанные) задачи старше max_age секунд"""
+        cutoff = time.time() - max_age
+        cursor = self.connection().execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed', 'held') AND run_after < ?", (cutoff,))
+        return cursor.rowcount
+
+    # Выполнение
+
+    def _claim(self):
+        """Захватывает готовую к выполнению задачу или возвращает None"""
+        conn = self.connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE (status = 'pending' AND run_after <= ?) "
+                "OR (status = 'running' AND locked_until < ?) ORDER BY id LIMIT 1",
+                (now, now)).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_by = ?, "
+                    "locked_until = ?, updated_at = ? WHERE id = ?",
+                    (f"{socket.gethostname()}:{os.getpid()}", now + self.lease, now_iso(), row['id']))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return row
+
+    def _finish(self, job_id, status, result=None, error=None, run_after=None):
+        self.connection().execute(
+            'UPDATE jobs SET status = ?, result = ?, error = ?, run_after = COALESCE(?, run_after), '
+            'locked_by = NULL, locked_until = NULL, updated_at = ? WHERE id = ?',
+            (status, json.dumps(result, ensure_ascii=False) if result is not None else None,
+             error, run_after, now_iso(), job_id))
+
+    def run_one(self):
+        """Выполняет одну готовую задачу; False, если таких нет"""
+        row = self._claim()
+        if row is None:
+            return False
+
+        kind = row['kind']
+        payload = json.loads(row['payload'])
+        function, on_failure = self._handlers.get(kind, (None, None))
+        attempts = row['attempts'] + 1
+        started = time.perf_counter()
+        try:
+            if function is None:
+                raise LookupError(f"Нет обработчика задач {kind}")
+            result = function(payload)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            outcome = 'retry' if attempts < row['max_attempts'] else 'failed'
+            JOB_SECONDS.observe(time.perf_counter() - started, kind=kind, outcome=outcome)
+            JOBS_FINISHED.inc(kind=kind, outcome=outcome)
+            print(f"Ошибка задачи {row['id']} ({kind}), попытка {attempts}: {error}")
+            traceback.print_exc()
+            if outcome == 'retry':
+                delay = self.retry_delay * 2 ** (attempts - 1)
+                self._finish(row['id'], 'pending', error=error, run_after=time.time() + delay)
+            else:
+                self._finish(row['id'], 'failed', error=error)
+                if on_failure:
+                    try:
+                        on_failure(payload, error)
+                    except Exception as e:
+                        print(f"Ошибка обработки сбоя задачи {row['id']}: {e}")
+            return True
+
+        JOB_SECONDS.observe(time.perf_counter() - started, kind=kind, outcome='done')
+        JOBS_FINISHED.inc(kind=kind, outcome='done')
+        self._finish(row['id'], 'done', result=result)
+        return True
+
+    def run_worker(self, stop=None):
+        """Цикл исполнителя: берет задачи, пока не будет установлен stop (threading.Event)"""
+        last_purge = 0
+        while stop is None or not stop.is_set():
+            try:
+                if self.run_one():
+                    continue
+                if time.time() - last_purge > 3600:
+                    last_purge = time.time()
+                    self.purge()
+            except sqlite3.Error as e:
+                print(f"Ошибка очереди задач {self.db_path}: {e}")
+            with self._wake:
+                self._wake.wait(self.poll_interval)
+
+    def start(self):
+        """Запускает пул потоков-исполнителей в этом процессе (если workers > 0)"""
+        if self.workers > 0:
+            self._threads.ensure()
@@ -0,0 +1,61 @@
+class LikeIndex:
+    """Лайки в памяти: для каждой игры множество пользователей и наоборот.
+
+    Проверка и изменение лайка - O(1), число лайков игры - размер ее
+    множества, поэтому счетчик likes не может разойтись со списком.
+    Для хранения отдается в виде записей {"game_id": id, "user_ids": [...]}.
+    """
+
+    def __init__(self):
+        self._by_game = {}
+        self._by_user = {}
+
+    def clear(self):
+        self._by_game = {}
+        self._by_user = {}
+
+    def load(self, records):
+        for record in records:
+            for user_id in record.get('user_ids', []):
+                self.set(record['game_id'], user_id, True)
+
+    def records(self):
+        return [{'game_id': game_id, 'user_ids': sorted(users)}
+                for game_id, users in sorted(self._by_game.items()) if users]
+
+    def set(self, game_id, user_id, liked):
+        """Ставит или снимает лайк, возвращает True, если что-то изменилось"""
+        users = self._by_game.get(game_id)
+        if liked:
+            if users is None:
+                users = self._by_game[game_id] = set()
+            elif user_id in users:
+                return False
+            users.add(user_id)
+            self._by_user.setdefault(user_id, set()).add(game_id)
+            return True
+
+        if not users or user_id not in users:
+            return False
+        users.discard(user_id)
+        if not users:
+            del self._by_game[game_id]
+        games = self._by_user.get(user_id)
+        games.discard(game_id)
+        if not games:
+            del self._by_user[user_id]
+        return True
+
+    def is_liked(self, game_id, user_id):
+        return user_id in self._by_game.get(game_id, ())
+
+    def count(self, game_id):
+        return len(self._by_game.get(game_id, ()))
+
+    def games_liked_by(self, user_id):
+        return set(self._by_user.get(user_id, ()))
+
+    def drop_game(self, game_id):
+        """Убирает все лайки удаленной игры"""
+        for user_id in list(self._by_game.get(game_id, ())):
+            self.set(game_id, user_id, False)
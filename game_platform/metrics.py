@@ -0,0 +1,245 @@
+import collections
+import contextlib
+from bisect import bisect_left
+import os
+import sys
+import threading
+import time
+
+from background import BackgroundThreads
+
+# Границы гистограмм времени (секунды)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Метрика с метками; значения хранятся отдельно для каждого набора меток"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: ожидаются метки {self.labelnames}, переданы {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+
+class Counter(Metric):
+    """Счетчик, который только растет (запросы, записанные байты)"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_samples(self, items):
+        for key, value in items:
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}'
+
+
+class Histogram(Metric):
+    """Распределение значений (обычно длительностей) по корзинам"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """with histogram.time(...): - замеряет длительность блока"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _render_samples(self, items):
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [('le', _format_number(bound))])
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labelnames, key)
+            yield f'{self.name}_sum{labels} {_format_number(total)}'
+            yield f'{self.name}_count{labels} {count}'
+
+
+class Registry:
+    """Набор метрик процесса, отдается в текстовом формате Prometheus.
+
+    Метрики живут в памяти процесса: при нескольких воркерах каждый
+    отдает свои, а складывает их Prometheus (по метке instance).
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Повторный импорт модуля не должен дублировать метрику
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Общий реестр: модули объявляют в нем свои метрики при импорте
+registry = Registry()
+counter = registry.counter
+histogram = registry.histogram
+
+# Формат ответа /metrics
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+STORAGE_CALL_SECONDS = histogram(
+    'gameform_storage_call_seconds', 'Длительность вызовов хранилища', ('backend', 'method'))
+
+
+class TimedStorage:
+    """Обертка над хранилищем, замеряющая каждый вызов его методов.
+
+    Остальные атрибуты отдаются как есть, поэтому обертку можно
+    подставить вместо хранилища (в том числе под BufferedCounters).
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._backend_name = type(backend).__name__
+        self._wrappers = {}
+
+    def __getattr__(self, name):
+        value = getattr(self.backend, name)
+        if name.startswith('_') or not callable(value):
+            return value
+        wrapper = self._wrappers.get(name)
+        if wrapper is None:
+            def wrapper(*args, **kwargs):
+                with STORAGE_CALL_SECONDS.time(backend=self._backend_name, method=name):
+                    return getattr(self.backend, name)(*args, **kwargs)
+            self._wrappers[name] = wrapper
+        return wrapper
+
+
+class SamplingProfiler:
+    """Сэмплирующий профилировщик запросов.
+
+    Пока запрос обрабатывается (между start() и stop() в его потоке),
+    фоновый поток каждые interval секунд запоминает, какая функция
+    выполняется. stop() возвращает самые частые места: функцию на вершине
+    стека и ближайшую к ней функцию из кода проекта (project_dir).
+    """
+
+    def __init__(self, interval=0.005, project_dir=None):
+        self.interval = interval
+        self.project_dir = os.path.abspath(project_dir or os.path.dirname(__file__))
+        self._active = {}  # id потока -> Counter мест
+        self._lock = threading.Lock()
+        # Поток сэмплирования запускается заново в каждом воркере после fork
+        self._thread = BackgroundThreads(self._run, 'sampling-profiler')
+        self._thread.on_fork.append(self._reset)
+
+    def start(self):
+        with self._lock:
+            self._active[threading.get_ident()] = collections.Counter()
+        self._thread.ensure()
+
+    def _reset(self):
+        # Запросы родителя в этом процессе не выполняются, а блокировку мог держать его поток
+        self._lock = threading.Lock()
+        self._active = {}
+
+    def stop(self, top=5):
+        """[(место, число сэмплов), ...] для запроса текущего потока"""
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+        return samples.most_common(top) if samples else []
+
+    def _in_project(self, frame):
+        return frame.f_code.co_filename.startswith(self.project_dir + os.sep)
+
+    def _describe(self, frame):
+        code = frame.f_code
+        if self._in_project(frame):
+            filename = os.path.relpath(code.co_filename, self.project_dir)
+        else:
+            filename = os.path.join(*code.co_filename.split(os.sep)[-2:])
+        return f"{filename}:{frame.f_lineno} {code.co_name}"
+
+    def _sample(self, frame):
+        places = [self._describe(frame)]
+        if not self._in_project(frame):
+            while frame is not None and not self._in_project(frame):
+                frame = frame.f_back
+            if frame is not None:
+                places.append(self._describe(frame))
+        return places
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, samples in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        samples.update(self._sample(frame))
@@ -0,0 +1,364 @@
+import hashlib
+import os
+import re
+
+from storage import write_atomic
+
+# Версия сборки: при изменении правил старые сборки пересобираются (flask reprocess-games)
+OPTIMIZER_VERSION = 2
+
+# Папка сборок внутри static; файлы называются по SHA-256 содержимого
+BUILD_DIR = 'games/build'
+
+# Встроенные скрипты и стили не меньше этого размера (после сжатия пробелов)
+# выносятся в отдельные файлы, которые браузер кэширует между запусками
+EXTRACT_MIN_BYTES = 4 * 1024
+
+# Типы <script>, содержимое которых - JavaScript
+JS_TYPES = ('', 'text/javascript', 'application/javascript', 'module')
+
+IDENTIFIER = re.compile(r'[\w$\\]')
+
+# После этих слов "/" начинает регулярное выражение, а не деление
+REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete',
+                  'void', 'throw', 'instanceof', 'yield', 'await'}
+
+# После ")" заголовка этих операторов "/" начинает регулярное выражение: if (x) /re/.test(s)
+HEADER_KEYWORDS = {'if', 'while', 'for', 'with'}
+
+# Перенос строки после этих символов (или перед ними) не нужен для ASI
+NEWLINE_AFTER = set('{;,(')
+NEWLINE_BEFORE = set('})]')
+
+
+class MinifyError(ValueError):
+    """Код не удалось разобрать: оставляем его как есть"""
+
+
+def _skip_quoted(text, start, quote):
+    """Позиция после строки, начинающейся с кавычки text[start]"""
+    i = start + 1
+    while i < len(text):
+        char = text[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == quote:
+            return i + 1
+        if char == '\n' and quote != '`':
+            break
+        i += 1
+    raise MinifyError('Незакрытая строка')
+
+
+def minify_css(css):
+    """Убирает комментарии и лишние пробелы из CSS (строки не меняются)"""
+    out = []
+    i = 0
+    pending_space = False
+    while i < len(css):
+        char = css[i]
+        if char in '"\'':
+            end = _skip_quoted(css, i, char)
+            if pending_space and out and out[-1][-1:] not in '{};,>:(':
+                out.append(' ')
+            pending_space = False
+            out.append(css[i:end])
+            i = end
+        elif css.startswith('/*', i):
+            end = css.find('*/', i + 2)
+            if end < 0:
+                raise MinifyError('Незакрытый комментарий')
+            pending_space = True
+            i = end + 2
+        elif char.isspace():
+            pending_space = True
+            i += 1
+        else:
+            if char in '{};,>)' or (out and out[-1][-1:] in '{};,>:('):
+                pending_space = False
+            if char == '}' and out and out[-1] == ';':
+                out.pop()
+            if pending_space and out:
+                out.append(' ')
+            pending_space = False
+            out.append(char)
+            i += 1
+    return ''.join(out).strip()
+
+
+class _JsWriter:
+    """Выход минификатора JS: следит, где пробел или перенос строки можно убрать"""
+
+    def __init__(self):
+        self.out = []
+        self.pending = None  # None, ' ' или '\n'
+        self.parens = []  # для каждой открытой "(" - открывает ли она заголовок if/while/for/with
+        self.closed_header = False  # последняя ")" закрыла такой заголовок
+
+    def last_char(self):
+        return self.out[-1][-1:] if self.out else ''
+
+    def space(self, newline=False):
+        if not self.out:
+            return
+        if newline:
+            self.pending = '\n'
+        elif self.pending is None:
+            self.pending = ' '
+
+    def write(self, token):
+        if self.pending:
+            prev, first = self.last_char(), token[0]
+            if self.pending == '\n':
+                if prev not in NEWLINE_AFTER and first not in NEWLINE_BEFORE:
+                    self.out.append('\n')
+            elif IDENTIFIER.match(prev) and IDENTIFIER.match(first):
+                self.out.append(' ')
+            elif prev == first and prev in '+-' or first == '.' or prev == '/' or first == '/':
+                # "a + +b", "1 .toString()", "a / /re/" нельзя склеивать
+                self.out.append(' ')
+            self.pending = None
+        self.out.append(token)
+
+    def text(self):
+        return ''.join(self.out)
+
+
+def _regex_allowed(writer):
+    """Может ли в этом месте начинаться регулярное выражение.
+
+    Если по предыдущему токену это не определить (после "}" бывает и конец
+    блока, и конец объекта), бросает MinifyError: лучше оставить скрипт
+    как есть, чем разобрать регулярное выражение как деление.
+    """
+    prev = writer.last_char()
+    if not prev or prev in '(,=:[!&|?{;+-*%<>~^':
+        return True
+    if prev == ')':
+        return writer.closed_header
+    if prev == '}':
+        raise MinifyError('Неоднозначный "/" после "}"')
+    if IDENTIFIER.match(prev):
+        match = re.search(r'[\w$]+$', writer.out[-1])
+        return bool(match) and match.group() in REGEX_KEYWORDS
+    return False
+
+
+def _skip_regex(js, start):
+    """Позиция после регулярного выражения /.../флаги, начинающегося в start"""
+    i = start + 1
+    in_class = False
+    while i < len(js):
+        char = js[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '\n':
+            break
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            i += 1
+            while i < len(js) and IDENTIFIER.match(js[i]):
+                i += 1
+            return i
+        i += 1
+    raise MinifyError('Незакрытое регулярное выражение')
+
+
+def minify_js(js):
+    """Консервативная минификация JavaScript.
+
+    Убирает комментарии, отступы, пустые строки и пробелы вокруг знаков.
+    Переносы строк сохраняются везде, где от них может зависеть
+    автоматическая расстановка точек с запятой; строки, шаблоны и регулярные
+    выражения копируются как есть. Если код не разобрался, бросает MinifyError.
+    """
+    writer = _JsWriter()
+    # Стек вложенности шаблонных строк: для каждой ${...} - глубина фигурных скобок
+    template_braces = []
+    i = 0
+    length = len(js)
+    while i < length:
+        char = js[i]
+        if char == '`' or (char == '}' and template_braces and template_braces[-1] == 0):
+            # Шаблонная строка (или ее продолжение после ${...}) до ` или следующей ${
+            if char == '}':
+                template_braces.pop()
+            j = i + 1
+            while j < length:
+                if js[j] == '\\':
+                    j += 2
+                    continue
+                if js[j] == '`':
+                    j += 1
+                    break
+                if js.startswith('${', j):
+                    j += 2
+                    template_braces.append(0)
+                    break
+                j += 1
+            else:
+                raise MinifyError('Незакрытая шаблонная строка')
+            writer.write(js[i:j])
+            i = j
+        elif char in '"\'':
+            end = _skip_quoted(js, i, char)
+            writer.write(js[i:end])
+            i = end
+        elif js.startswith('//', i):
+            end = js.find('\n', i)
+            i = length if end < 0 else end
+        elif js.startswith('/*', i):
+            end = js.find('*/', i + 2)
+            if end < 0:
+                raise MinifyError('Незакрытый комментарий')
+            writer.space(newline='\n' in js[i:end])
+            i = end + 2
+        elif char == '/' and _regex_allowed(writer):
+            end = _skip_regex(js, i)
+            writer.write(js[i:end])
+            i = end
+        elif char.isspace():
+            writer.space(newline=char in '\n\r\u2028\u2029')
+            i += 1
+        else:
+            if template_braces:
+                if char == '{':
+                    template_braces[-1] += 1
+                elif char == '}':
+                    template_braces[-1] -= 1
+            j = i + 1
+            if IDENTIFIER.match(char):
+                while j < length and IDENTIFIER.match(js[j]):
+                    j += 1
+            elif char == '(':
+                writer.parens.append(bool(writer.out) and writer.out[-1] in HEADER_KEYWORDS)
+            elif char == ')':
+                if not writer.parens:
+                    raise MinifyError('Лишняя ")"')
+                writer.closed_header = writer.parens.pop()
+            writer.write(js[i:j])
+            i = j
+    if template_braces:
+        raise MinifyError('Незакрытая шаблонная строка')
+    return writer.text()
+
+
+# Части HTML: комментарии, элементы с "сырым" содержимым, теги и текст
+HTML_PARTS = re.compile(
+    r'(?P<comment><!--.*?-->)'
+    r'|(?P<raw><(?P<tag>script|style|pre|textarea)\b(?P<attrs>[^>]*)>(?P<body>.*?)</(?P=tag)\s*>)'
+    r'|(?P<element><[^>]*>)',
+    re.IGNORECASE | re.DOTALL)
+ATTRIBUTE = re.compile(r'([^\s=/>]+)(?:\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+))?')
+
+
+def _attributes(attrs):
+    """{имя: значение} атрибутов тега (имена в нижнем регистре)"""
+    result = {}
+    for name, value in ATTRIBUTE.findall(attrs):
+        if value[:1] in '"\'' and value:
+            value = value[1:-1]
+        result[name.lower()] = value
+    return result
+
+
+def _collapse_text(text):
+    return re.sub(r'\s+', ' ', text)
+
+
+def optimize_html(html, extract_min_bytes=EXTRACT_MIN_BYTES):
+    """Минифицирует HTML вместе со встроенными CSS и JS.
+
+    Возвращает (html, assets), где assets - [(расширение, содержимое)]
+    вынесенных скриптов и стилей; в html на их место стоят ссылки
+    "<sha256>.<расширение>" (файлы кладутся рядом со сборкой).
+    Код, который не удалось разобрать, остается без изменений.
+    """
+    out = []
+    assets = []
+    position = 0
+
+    def extracted(extension, content):
+        name = f"{hashlib.sha256(content.encode('utf-8')).hexdigest()}.{extension}"
+        assets.append((name, content))
+        return name
+
+    for match in HTML_PARTS.finditer(html):
+        out.append(_collapse_text(html[position:match.start()]))
+        position = match.end()
+
+        if match.group('comment'):
+            comment = match.group('comment')
+            # Условные комментарии IE оставляем
+            if comment.startswith('<!--[if') or comment.startswith('<!--<!'):
+                out.append(comment)
+            continue
+        if match.group('element'):
+            out.append(match.group('element'))
+            continue
+
+        tag = match.group('tag').lower()
+        attrs = match.group('attrs')
+        body = match.group('body')
+        attributes = _attributes(attrs)
+        if tag == 'script' and 'src' not in attributes and attributes.get('type', '').lower() in JS_TYPES:
+            try:
+                body = minify_js(body)
+            except MinifyError:
+                pass
+            # defer и async у встроенного скрипта не действуют, а у внешнего изменили бы порядок
+            if len(body.encode('utf-8')) >= extract_min_bytes and not {'defer', 'async'} & set(attributes):
+                out.append(f'<script{attrs} src="{extracted("js", body)}"></script>')
+                continue
+        elif tag == 'style' and attributes.get('type', 'text/css').lower() == 'text/css':
+            try:
+                body = minify_css(body)
+            except MinifyError:
+                pass
+            if len(body.encode('utf-8')) >= extract_min_bytes and set(attributes) <= {'type', 'media'}:
+                media = f' media="{attributes["media"]}"' if attributes.get('media') else ''
+                out.append(f'<link rel="stylesheet" href="{extracted("css", body)}"{media}>')
+                continue
+        elif tag in ('pre', 'textarea'):
+            out.append(match.group(0))
+            continue
+        out.append(f'<{match.group("tag")}{attrs}>{body}</{match.group("tag")}>')
+
+    out.append(_collapse_text(html[position:]))
+    return ''.join(out).strip(), assets
+
+
+def _write_blob(static_dir, name, content):
+    """Записывает файл сборки, если файла с таким содержимым еще нет"""
+    path = f"{BUILD_DIR}/{name}"
+    full_path = os.path.join(static_dir, path)
+    if not os.path.exists(full_path):
+        write_atomic(full_path, lambda f: f.write(content))
+    return path
+
+
+def build_game(static_dir, html_path, extract_min_bytes=EXTRACT_MIN_BYTES):
+    """Собирает оптимизированную версию игры из исходного HTML (он не меняется).
+
+    Возвращает запись для поля build игры: {'html': путь сборки, 'assets': [...],
+    'version': OPTIMIZER_VERSION, 'source_bytes': ..., 'bytes': ...}.
+    Бросает OSError и UnicodeDecodeError.
+    """
+    with open(os.path.join(static_dir, html_path), encoding='utf-8') as f:
+        source = f.read()
+    html, assets = optimize_html(source, extract_min_bytes)
+
+    asset_paths = [_write_blob(static_dir, name, content) for name, content in assets]
+    html_name = f"{hashlib.sha256(html.encode('utf-8')).hexdigest()}.html"
+    return {
+        'html': _write_blob(static_dir, html_name, html),
+        'assets': asset_paths,
+        'version': OPTIMIZER_VERSION,
+        'source_bytes': len(source.encode('utf-8')),
+        'bytes': len(html.encode('utf-8')) + sum(len(content.encode('utf-8')) for _, content in assets)
+    }
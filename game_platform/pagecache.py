@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class PageCache:
+    """Кэш готовых HTML страниц в памяти процесса.
+
+    Запись свежая, пока не прошло ttl секунд и не было invalidate().
+    Устаревшую запись перерисовывает только один запрос (тот, что пришел
+    первым), а остальные в это время получают старую версию
+    (stale-while-revalidate). Старше max_stale секунд версия не отдается.
+    Хранится не больше max_entries страниц, вытесняются давно не читанные.
+    При ttl <= 0 кэш выключен.
+    """
+
+    def __init__(self, ttl=30, max_stale=300, max_entries=256):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (html, время отрисовки, поколение)
+        self._refreshing = set()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Помечает все страницы устаревшими (после изменения их данных)"""
+        with self._lock:
+            self._generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def get(self, key, render):
+        """Возвращает страницу из кэша или результат render()"""
+        if self.ttl <= 0:
+            return render()
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+                html, rendered_at, generation = entry
+                age = now - rendered_at
+                if generation == self._generation and age < self.ttl:
+                    return html
+                if key in self._refreshing and age < self.max_stale:
+                    return html
+            self._refreshing.add(key)
+            # Изменения во время отрисовки сделают запись устаревшей сразу
+            generation = self._generation
+
+        try:
+            html = render()
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+        with self._lock:
+            self._entries[key] = (html, now, generation)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html
@@ -0,0 +1,66 @@
+import base64
+import binascii
+import json
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class PaginationError(ValueError):
+    """Некорректные параметры страницы (cursor, limit)"""
+
+
+def encode_cursor(position):
+    """Позиция последнего элемента страницы -> непрозрачная строка для ?cursor="""
+    data = json.dumps(position, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, binascii.Error) as e:
+        raise PaginationError('Некорректный cursor') from e
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except ValueError as e:
+        raise PaginationError('limit должен быть числом') from e
+    if limit < 1:
+        raise PaginationError('limit должен быть больше нуля')
+    return min(limit, maximum)
+
+
+def paginate(items, key, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Страница по ключу (keyset): элементы, идущие после cursor.
+
+    items должны быть отсортированы по возрастанию key(item), а ключ - уникален
+    (обычно (значение сортировки, id)). Курсор хранит ключ последнего элемента,
+    поэтому вставки и удаления до него не сдвигают следующие страницы.
+    Возвращает (элементы, cursor следующей страницы или None).
+    """
+    after = decode_cursor(cursor)
+    if after is not None:
+        try:
+            after = tuple(after) if isinstance(after, list) else (after,)
+            page_start = next((i for i, item in enumerate(items) if _as_tuple(key(item)) > after), len(items))
+        except TypeError as e:
+            raise PaginationError('Некорректный cursor') from e
+    else:
+        page_start = 0
+
+    page = items[page_start:page_start + limit]
+    has_more = page_start + limit < len(items)
+    next_cursor = encode_cursor(list(_as_tuple(key(page[-1])))) if page and has_more else None
+    return page, next_cursor
+
+
+def _as_tuple(value):
+    return value if isinstance(value, tuple) else (value,)
@@ -0,0 +1,171 @@
+import math
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+
+from indexes import CatalogIndex
+
+# Рейтинги: ключ сортировки по возрастанию (первым идет лучший), последним - id
+RANKING_KINDS = ('likes', 'plays', 'newest', 'trending')
+# Порядки, которые хранит индекс: рейтинги и алфавит (только для /api/games)
+SORT_KINDS = RANKING_KINDS + ('title',)
+
+# Trending в духе "hot" Reddit: log10(активность) + время создания / TRENDING_PERIOD.
+# Каждые TRENDING_PERIOD секунд новизна весит как десятикратная активность,
+# поэтому старые игры опускаются без пересчета ключей со временем.
+TRENDING_PERIOD = 45000
+TRENDING_PLAY_WEIGHT = 0.1
+
+
+def trending_score(game):
+    activity = game.get('likes', 0) + TRENDING_PLAY_WEIGHT * game.get('plays', 0)
+    try:
+        created = datetime.fromisoformat(game.get('created_at') or '').timestamp()
+    except ValueError:
+        created = 0
+    return math.log10(max(activity, 1)) + created / TRENDING_PERIOD
+
+
+def ranking_keys(game):
+    """{рейтинг: ключ} для игры; ключи уникальны за счет id"""
+    game_id = game['id']
+    return {
+        'likes': (-game.get('likes', 0), -game_id),
+        'plays': (-game.get('plays', 0), -game_id),
+        'newest': (-game_id,),
+        'trending': (-trending_score(game), -game_id),
+        'title': (game.get('title', '').lower(),),
+    }
+
+
+class SortedList:
+    """Отсортированный список из блоков ограниченного размера.
+
+    Вставка и удаление - бинарный поиск блока и сдвиг внутри одного блока,
+    а не всего списка, поэтому обновление рейтинга не требует пересортировки.
+    """
+
+    def __init__(self, load=256):
+        self._load = load
+        self._lists = []
+        self._maxes = []
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for sublist in self._lists:
+            yield from sublist
+
+    def add(self, value):
+        if not self._maxes:
+            self._lists.append([value])
+            self._maxes.append(value)
+        else:
+            pos = bisect_left(self._maxes, value)
+            if pos == len(self._maxes):
+                pos -= 1
+                self._lists[pos].append(value)
+                self._maxes[pos] = value
+            else:
+                insort(self._lists[pos], value)
+            self._split(pos)
+        self._len += 1
+
+    def _split(self, pos):
+        sublist = self._lists[pos]
+        if len(sublist) > 2 * self._load:
+            tail = sublist[self._load:]
+            del sublist[self._load:]
+            self._maxes[pos] = sublist[-1]
+            self._lists.insert(pos + 1, tail)
+            self._maxes.insert(pos + 1, tail[-1])
+
+    def remove(self, value):
+        pos = bisect_left(self._maxes, value)
+        if pos == len(self._maxes):
+            raise ValueError(value)
+        sublist = self._lists[pos]
+        index = bisect_left(sublist, value)
+        if index == len(sublist) or sublist[index] != value:
+            raise ValueError(value)
+        del sublist[index]
+        self._len -= 1
+        if sublist:
+            self._maxes[pos] = sublist[-1]
+        else:
+            del self._lists[pos]
+            del self._maxes[pos]
+
+    def after(self, value=None, inclusive=False):
+        """Элементы больше value (или равные, если inclusive; все, если value не задано)"""
+        if value is None:
+            yield from self
+            return
+        bisect = bisect_left if inclusive else bisect_right
+        pos = bisect(self._maxes, value)
+        if pos == len(self._maxes):
+            return
+        yield from self._lists[pos][bisect(self._lists[pos], value):]
+        for sublist in self._lists[pos + 1:]:
+            yield from sublist
+
+
+class Rankings(CatalogIndex):
+    """Рейтинги игр (лайки, запуски, новые, trending) по всем играм и по категориям"""
+
+    def _clear(self):
+        self._indexes = {}  # (рейтинг, категория или None) -> SortedList
+        self._entries = {}  # game_id -> (категория, {рейтинг: ключ})
+
+    def _index(self, kind, category):
+        index = self._indexes.get((kind, category))
+        if index is None:
+            index = self._indexes[(kind, category)] = SortedList()
+        return index
+
+    def _add(self, game):
+        category = game.get('category')
+        keys = ranking_keys(game)
+        for kind, key in keys.items():
+            value = key + (game['id'],)
+            self._index(kind, None).add(value)
+            self._index(kind, category).add(value)
+        self._entries[game['id']] = (category, keys)
+
+    def _remove(self, game_id):
+        entry = self._entries.pop(game_id, None)
+        if not entry:
+            return
+        category, keys = entry
+        for kind, key in keys.items():
+            value = key + (game_id,)
+            self._indexes[(kind, None)].remove(value)
+            self._indexes[(kind, category)].remove(value)
+
+    def _update(self, game_id, game):
+        entry = self._entries.get(game_id)
+        if game and entry and entry == (game.get('category'), ranking_keys(game)):
+            return
+        self._remove(game_id)
+        if game:
+            self._add(game)
+
+    def top(self, kind, category=None, limit=None, after=None):
+        """Лучшие игры рейтинга: [(ключ..., game_id), ...].
+
+        after - последний элемент предыдущей страницы, выдача продолжается после него.
+        """
+        if kind not in SORT_KINDS:
+            raise KeyError(kind)
+        self.sync()
+        with self._lock:
+            index = self._indexes.get((kind, category or None))
+            if index is None:
+                return []
+            result = []
+            for value in index.after(after):
+                if limit is not None and len(result) >= limit:
+                    break
+                result.append(value)
+            return result
@@ -0,0 +1,111 @@
+import codecs
+import re
+import time
+
+from metrics import counter, histogram
+
+SCAN_SECONDS = histogram('gameform_content_scan_seconds', 'Время проверки одного файла на запрещенные слова')
+SCANNED_CHARS = counter('gameform_content_scanned_chars_total', 'Символов проверено сканером')
+
+
+def _trie_pattern(terms):
+    """Собирает регулярное выражение в форме префиксного дерева.
+
+    Общие префиксы слов (порно/порн, нарко/наркотики) проверяются один раз,
+    поэтому поиск всех слов - это один проход движка re по тексту.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[None] = True
+
+    def build(node):
+        is_end = None in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items(), key=lambda x: str(x[0]))
+                    if char is not None]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if is_end:
+            body = f'(?:{body})?'
+        return body
+
+    return build(trie)
+
+
+class ContentScanner:
+    """Проверка контента на запрещенные слова за один проход.
+
+    words - запрещенные слова, в вердикте называется первое найденное по порядку списка.
+    patterns - дополнительные подозрительные подстроки с общим сообщением.
+    Выражение компилируется один раз при создании сканера.
+    """
+
+    def __init__(self, words, patterns=()):
+        self.words = list(words)
+        self.patterns = list(patterns)
+        terms = list(dict.fromkeys(self.words + self.patterns))
+        self.regex = re.compile(_trie_pattern(terms))
+        self.overlap = max(len(term) for term in terms) - 1
+
+    def stream(self):
+        """Создает потоковую проверку для данных, поступающих частями"""
+        return ScanStream(self)
+
+    def check(self, text):
+        """Проверяет строку целиком, возвращает (is_safe, message)"""
+        stream = self.stream()
+        stream.feed(text)
+        return stream.verdict()
+
+
+class ScanStream:
+    """Состояние потоковой проверки.
+
+    Между частями сохраняется хвост длиной (самое длинное слово - 1),
+    чтобы находить слова на стыке частей. Байты декодируются из UTF-8
+    по частям; некорректный UTF-8 вызывает UnicodeDecodeError.
+    """
+
+    def __init__(self, scanner):
+        self.scanner = scanner
+        self.found_words = set()
+        self.found_pattern = False
+        self._tail = ''
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._elapsed = 0.0
+        self._chars = 0
+
+    def feed(self, text):
+        started = time.perf_counter()
+        window = self._tail + text.lower()
+        # Почти весь контент чистый: точный разбор делаем только для окон с совпадением
+        if self.scanner.regex.search(window):
+            self._collect(window)
+        self._tail = window[-self.scanner.overlap:] if self.scanner.overlap else ''
+        self._elapsed += time.perf_counter() - started
+        self._chars += len(text)
+
+    def feed_bytes(self, data, final=False):
+        self.feed(self._decoder.decode(data, final))
+
+    def _collect(self, window):
+        for index, word in enumerate(self.scanner.words):
+            if word in window:
+                self.found_words.add(index)
+        if not self.found_pattern:
+            self.found_pattern = any(pattern in window for pattern in self.scanner.patterns)
+
+    def verdict(self):
+        if self._chars or self._elapsed:
+            SCAN_SECONDS.observe(self._elapsed)
+            SCANNED_CHARS.inc(self._chars)
+            self._elapsed, self._chars = 0.0, 0
+        if self.found_words:
+            word = self.scanner.words[min(self.found_words)]
+            return False, f"Обнаружено запрещенное слово: {word}"
+        if self.found_pattern:
+            return False, "Обнаружен запрещенный контент"
+        return True, "Контент прошел проверку"
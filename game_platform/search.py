@@ -0,0 +1,190 @@
+import heapq
+import math
+import re
+
+from indexes import CatalogIndex
+from ranking import SortedList
+
+TOKEN = re.compile(r'\w+')
+CYRILLIC = re.compile('[а-я]')
+
+# Вес совпадения в зависимости от поля
+FIELD_WEIGHTS = {'title': 3.0, 'creator': 2.0, 'description': 1.0}
+
+# Окончания русских слов, самые длинные проверяются первыми
+RUSSIAN_ENDINGS = sorted([
+    'иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'его', 'ого', 'ему', 'ому',
+    'ыми', 'ими', 'ешь', 'ете', 'ите', 'ует', 'уют', 'ать', 'ять', 'ить', 'еть', 'ться',
+    'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ый', 'ий', 'ой', 'ей', 'ом', 'ем', 'ам', 'ям',
+    'ах', 'ях', 'ов', 'ев', 'ью', 'ую', 'юю', 'ия', 'ья', 'ть', 'ет', 'ит', 'ут', 'ют',
+    'ат', 'ят', 'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+], key=len, reverse=True)
+
+# Основа слова не короче этого числа букв
+MIN_STEM = 3
+
+# Сколько слов с общим началом учитывать при поиске по префиксу
+PREFIX_EXPANSION_LIMIT = 64
+
+# Насколько лайки поднимают результат: релевантность * (1 + вес * ln(1 + лайки))
+LIKES_WEIGHT = 0.2
+
+
+def tokenize(text):
+    return TOKEN.findall((text or '').lower().replace('ё', 'е'))
+
+
+def stem(token):
+    """Упрощенный стемминг: отбрасывает окончание, чтобы "гонки" и "гонка" совпадали"""
+    if CYRILLIC.search(token):
+        for ending in RUSSIAN_ENDINGS:
+            if token.endswith(ending) and len(token) - len(ending) >= MIN_STEM:
+                return token[:-len(ending)]
+        return token
+
+    if token.endswith('sses') or token.endswith('ies'):
+        token = token[:-2]
+    elif token.endswith('s') and not token.endswith('ss') and len(token) > MIN_STEM:
+        token = token[:-1]
+    for suffix in ('ing', 'ed', 'ly', 'er'):
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM:
+            token = token[:-len(suffix)]
+            break
+    if token.endswith('e') and len(token) > MIN_STEM:
+        token = token[:-1]
+    return token
+
+
+class SearchIndex(CatalogIndex):
+    """Обратный индекс по названию, описанию и автору игр.
+
+    Для каждой основы слова хранится {game_id: вес}. Для поиска по началу
+    слова (подсказки при вводе) есть отсортированные списки основ и самих
+    слов: недописанное слово ищется среди слов без стемминга, потому что
+    его начало может не быть началом основы ("racin" для "racing" -> "rac").
+    Результаты ранжируются по TF-IDF с учетом поля и поднимаются лайками.
+    """
+
+    def _clear(self):
+        self._postings = {}  # основа -> {game_id: вес}
+        self._terms = SortedList()
+        self._words = SortedList()
+        self._word_counts = {}  # слово -> число игр, где оно встречается
+        self._documents = {}  # game_id -> ((название, описание, автор), {основа: вес}, слова)
+        self._likes = {}
+        self._titles = {}
+
+    def _update(self, game_id, game):
+        if game:
+            self._likes[game_id] = game.get('likes', 0)
+            self._titles[game_id] = game.get('title', '')
+            signature = (game.get('title'), game.get('description'), game.get('creator'))
+            document = self._documents.get(game_id)
+            if document and document[0] == signature:
+                return
+        self._remove(game_id)
+        if not game:
+            self._likes.pop(game_id, None)
+            self._titles.pop(game_id, None)
+            return
+
+        weights = {}
+        words = set()
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(game.get(field)):
+                words.add(token)
+                term = stem(token)
+                weights[term] = weights.get(term, 0) + weight
+        for term, weight in weights.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._terms.add(term)
+            postings[game_id] = weight
+        for word in words:
+            if word not in self._word_counts:
+                self._word_counts[word] = 0
+                self._words.add(word)
+            self._word_counts[word] += 1
+        self._documents[game_id] = (signature, weights, words)
+
+    def _remove(self, game_id):
+        document = self._documents.pop(game_id, None)
+        if not document:
+            return
+        for term in document[1]:
+            postings = self._postings[term]
+            del postings[game_id]
+            if not postings:
+                del self._postings[term]
+                self._terms.remove(term)
+        for word in document[2]:
+            self._word_counts[word] -= 1
+            if not self._word_counts[word]:
+                del self._word_counts[word]
+                self._words.remove(word)
+
+    @staticmethod
+    def _starting_with(values, prefix):
+        """Не больше PREFIX_EXPANSION_LIMIT значений отсортированного списка, начинающихся с prefix"""
+        found = []
+        for candidate in values.after(prefix, inclusive=True):
+            if not candidate.startswith(prefix) or len(found) >= PREFIX_EXPANSION_LIMIT:
+                break
+            found.append(candidate)
+        return found
+
+    def _matches(self, token, prefix):
+        """{game_id: вес * idf} для слова (при prefix - для всех слов, начинающихся с него)"""
+        term = stem(token)
+        if prefix:
+            # Основы с началом основы токена ("races" -> "rac") и основы слов
+            # с началом самого токена ("racin" -> "racing" -> "rac")
+            terms = set(self._starting_with(self._terms, term))
+            terms.update(stem(word) for word in self._starting_with(self._words, token))
+        else:
+            terms = [term] if term in self._postings else []
+
+        total = len(self._documents)
+        matches = {}
+        for candidate in terms:
+            postings = self._postings[candidate]
+            idf = math.log(1 + total / len(postings))
+            for game_id, weight in postings.items():
+                matches[game_id] = max(matches.get(game_id, 0), weight * idf)
+        return matches
+
+    def search(self, query, limit=20, prefix=True):
+        """[(оценка, game_id), ...] игр, где есть все слова запроса.
+
+        При prefix последнее слово может быть недописанным (если запрос
+        не заканчивается пробелом).
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        partial = prefix and not query[-1].isspace()
+
+        self.sync()
+        with self._lock:
+            scores = None
+            for position, token in enumerate(tokens):
+                matches = self._matches(token, partial and position == len(tokens) - 1)
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {game_id: score + matches[game_id]
+                              for game_id, score in scores.items() if game_id in matches}
+                if not scores:
+                    return []
+
+            return heapq.nlargest(limit, (
+                (score * (1 + LIKES_WEIGHT * math.log1p(self._likes.get(game_id, 0))), game_id)
+                for game_id, score in scores.items()
+            ))
+
+    def suggest(self, query, limit=8):
+        """Подсказки для ввода: [(game_id, название), ...]"""
+        results = self.search(query, limit)
+        with self._lock:
+            return [(game_id, self._titles.get(game_id, '')) for _, game_id in results]
@@ -0,0 +1,359 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from storage import JsonBackend, StorageBackend, StorageError, now_iso
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    created_at TEXT,
+    last_login TEXT
+);
+
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    creator TEXT,
+    creator_id INTEGER,
+    description TEXT,
+    category TEXT,
+    html_file TEXT,
+    cover_image TEXT,
+    likes INTEGER NOT NULL DEFAULT 0,
+    plays INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT,
+    updated_at TEXT,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS games_creator ON games (creator_id);
+CREATE INDEX IF NOT EXISTS games_category ON games (category);
+
+CREATE TABLE IF NOT EXISTS comments (
+    game_id INTEGER NOT NULL REFERENCES games (id) ON DELETE CASCADE,
+    id INTEGER NOT NULL,
+    user TEXT,
+    user_id INTEGER,
+    text TEXT NOT NULL,
+    timestamp TEXT,
+    PRIMARY KEY (game_id, id)
+);
+
+CREATE TABLE IF NOT EXISTS likes (
+    game_id INTEGER NOT NULL REFERENCES games (id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (game_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS likes_user ON likes (user_id);
+
+-- Последняя версия каталога, в которой менялась каждая игра (удаленные остаются с deleted = 1)
+CREATE TABLE IF NOT EXISTS catalog_changes (
+    game_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS catalog_changes_version ON catalog_changes (version);
+"""
+
+# Колонки таблицы games, остальные поля записи хранятся в extra как JSON
+GAME_COLUMNS = ('title', 'creator', 'creator_id', 'description', 'category',
+                'html_file', 'cover_image', 'likes', 'plays', 'created_at', 'updated_at')
+USER_COLUMNS = ('username', 'password', 'created_at', 'last_login')
+
+
+class SqliteBackend(StorageBackend):
+    """Хранилище в SQLite (режим WAL): каждое изменение обновляет одну строку.
+
+    Соединения создаются отдельно для каждого потока.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.connection().executescript(SCHEMA)
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        # Соединение, открытое до fork (например, при предзагрузке), воркеру не годится
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def transaction(self):
+        """Транзакция с блокировкой записи (BEGIN IMMEDIATE)"""
+        return _Transaction(self.connection())
+
+    @staticmethod
+    def _record_changes(conn, game_ids, deleted=False):
+        """Поднимает версию каталога для измененных игр (внутри транзакции)"""
+        for game_id in dict.fromkeys(game_ids):
+            conn.execute('INSERT INTO catalog_changes (game_id, version, deleted) '
+                         'VALUES (?, (SELECT COALESCE(MAX(version), 0) + 1 FROM catalog_changes), ?) '
+                         'ON CONFLICT (game_id) DO UPDATE SET version = excluded.version, deleted = excluded.deleted',
+                         (game_id, int(deleted)))
+
+    # Пользователи
+
+    def count_users(self):
+        return self.connection().execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+    def get_user_by_username(self, username):
+        row = self.connection().execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+        return dict(row) if row else None
+
+    def add_user(self, user):
+        try:
+            with self.transaction() as conn:
+                cursor = conn.execute(
+                    'INSERT INTO users (username, password, created_at, last_login) VALUES (?, ?, ?, ?)',
+                    tuple(user.get(column) for column in USER_COLUMNS))
+            return dict(user, id=cursor.lastrowid)
+        except sqlite3.Error as e:
+            print(f"Ошибка сохранения пользователя: {e}")
+            return None
+
+    def update_user(self, user_id, fields):
+        fields = {k: v for k, v in fields.items() if k in USER_COLUMNS}
+        if not fields:
+            return True
+        assignments = ', '.join(f'{column} = ?' for column in fields)
+        with self.transaction() as conn:
+            cursor = conn.execute(f'UPDATE users SET {assignments} WHERE id = ?', (*fields.values(), user_id))
+        return cursor.rowcount > 0
+
+    # Игры
+
+    def _game_from_row(self, row):
+        game = dict(row)
+        extra = json.loads(game.pop('extra') or '{}')
+        game.update(extra)
+        return game
+
+    def list_games(self):
+        conn = self.connection()
+        games = {row['id']: self._game_from_row(row) for row in conn.execute('SELECT * FROM games ORDER BY id')}
+        for game in games.values():
+            game['comments'] = []
+        for row in conn.execute('SELECT * FROM comments ORDER BY game_id, id'):
+            comment = dict(row)
+            games[comment.pop('game_id')]['comments'].append(comment)
+        return list(games.values())
+
+    def get_game(self, game_id):
+        conn = self.connection()
+        row = conn.execute('SELECT * FROM games WHERE id = ?', (game_id,)).fetchone()
+        if not row:
+            return None
+        game = self._game_from_row(row)
+        game['comments'] = [
+            {k: r[k] for k in r.keys() if k != 'game_id'}
+            for r in conn.execute('SELECT * FROM comments WHERE game_id = ? ORDER BY id', (game_id,))
+        ]
+        return game
+
+    def games_by_creator(self, creator_id):
+        ids = [r[0] for r in self.connection().execute('SELECT id FROM games WHERE creator_id = ?', (creator_id,))]
+        return [self.get_game(game_id) for game_id in ids]
+
+    def _split_fields(self, fields, extra=None):
+        columns = {k: v for k, v in fields.items() if k in GAME_COLUMNS}
+        extra = dict(extra or {})
+        extra.update({k: v for k, v in fields.items()
+                      if k not in GAME_COLUMNS and k not in ('id', 'comments', 'liked_by')})
+        return columns, extra
+
+    def add_game(self, game):
+        columns, extra = self._split_fields(game)
+        names = list(columns) + ['extra']
+        try:
+            with self.transaction() as conn:
+                cursor = conn.execute(
+                    f"INSERT INTO games ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                    (*columns.values(), json.dumps(extra, ensure_ascii=False)))
+                self._record_changes(conn, [cursor.lastrowid])
+            return dict(game, id=cursor.lastrowid)
+        except sqlite3.Error as e:
+            print(f"Ошибка сохранения игры: {e}")
+            return None
+
+    def update_game(self, game_id, fields, touch=True):
+        if touch:
+            fields = dict(fields, updated_at=now_iso())
+        with self.transaction() as conn:
+            row = conn.execute('SELECT extra FROM games WHERE id = ?', (game_id,)).fetchone()
+            if not row:
+                return False
+            columns, extra = self._split_fields(fields, json.loads(row['extra']))
+            assignments = ''.join(f'{column} = ?, ' for column in columns)
+            conn.execute(f'UPDATE games SET {assignments}extra = ? WHERE id = ?',
+                         (*columns.values(), json.dumps(extra, ensure_ascii=False), game_id))
+            self._record_changes(conn, [game_id])
+        return True
+
+    def delete_game(self, game_id):
+        with self.transaction() as conn:
+            cursor = conn.execute('DELETE FROM games WHERE id = ?', (game_id,))
+            if cursor.rowcount:
+                self._record_changes(conn, [game_id], deleted=True)
+        return cursor.rowcount > 0
+
+    def increment_plays(self, game_id, amount=1):
+        with self.transaction() as conn:
+            conn.execute('UPDATE games SET plays = plays + ?, updated_at = ? WHERE id = ?',
+                         (amount, now_iso(), game_id))
+            row = conn.execute('SELECT plays FROM games WHERE id = ?', (game_id,)).fetchone()
+            if row:
+                self._record_changes(conn, [game_id])
+        return row['plays'] if row else None
+
+    def toggle_like(self, game_id, user_id):
+        with self.transaction() as conn:
+            if not conn.execute('SELECT 1 FROM games WHERE id = ?', (game_id,)).fetchone():
+                return None
+            cursor = conn.execute('DELETE FROM likes WHERE game_id = ? AND user_id = ?', (game_id, user_id))
+            is_liked = cursor.rowcount == 0
+            if is_liked:
+                conn.execute('INSERT INTO likes (game_id, user_id) VALUES (?, ?)', (game_id, user_id))
+            conn.execute('UPDATE games SET likes = (SELECT COUNT(*) FROM likes WHERE game_id = ?), '
+                         'updated_at = ? WHERE id = ?', (game_id, now_iso(), game_id))
+            likes = conn.execute('SELECT likes FROM games WHERE id = ?', (game_id,)).fetchone()[0]
+            self._record_changes(conn, [game_id])
+        return likes, is_liked
+
+    def is_liked(self, game_id, user_id):
+        return self.connection().execute('SELECT 1 FROM likes WHERE game_id = ? AND user_id = ?',
+                                         (game_id, user_id)).fetchone() is not None
+
+    def liked_game_ids(self, user_id):
+        return {row[0] for row in self.connection().execute('SELECT game_id FROM likes WHERE user_id = ?', (user_id,))}
+
+    def apply_counters(self, plays, likes):
+        now = now_iso()
+        with self.transaction() as conn:
+            changed = [game_id for game_id, amount in plays.items()
+                       if conn.execute('UPDATE games SET plays = plays + ?, updated_at = ? WHERE id = ?',
+                                       (amount, now, game_id)).rowcount]
+            for game_id, changes in likes.items():
+                if not conn.execute('SELECT 1 FROM games WHERE id = ?', (game_id,)).fetchone():
+                    continue
+                changed.append(game_id)
+                conn.executemany('INSERT OR IGNORE INTO likes (game_id, user_id) VALUES (?, ?)',
+                                 [(game_id, user_id) for user_id, liked in changes.items() if liked])
+                conn.executemany('DELETE FROM likes WHERE game_id = ? AND user_id = ?',
+                                 [(game_id, user_id) for user_id, liked in changes.items() if not liked])
+                conn.execute('UPDATE games SET likes = (SELECT COUNT(*) FROM likes WHERE game_id = ?), '
+                             'updated_at = ? WHERE id = ?', (game_id, now, game_id))
+            self._record_changes(conn, changed)
+        return True
+
+    def add_comment(self, game_id, comment):
+        with self.transaction() as conn:
+            if not conn.execute('SELECT 1 FROM games WHERE id = ?', (game_id,)).fetchone():
+                return None
+            comment_id = conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM comments WHERE game_id = ?',
+                                      (game_id,)).fetchone()[0]
+            comment = dict(comment, id=comment_id)
+            conn.execute('INSERT INTO comments (game_id, id, user, user_id, text, timestamp) '
+                         'VALUES (?, ?, ?, ?, ?, ?)',
+                         (game_id, comment_id, comment.get('user'), comment.get('user_id'),
+                          comment.get('text'), comment.get('timestamp')))
+            conn.execute('UPDATE games SET updated_at = ? WHERE id = ?', (now_iso(), game_id))
+            self._record_changes(conn, [game_id])
+        return comment
+
+    def delete_comment(self, game_id, comment_id):
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM comments WHERE game_id = ? AND id = ?', (game_id, comment_id))
+            cursor = conn.execute('UPDATE games SET updated_at = ? WHERE id = ?', (now_iso(), game_id))
+            if cursor.rowcount:
+                self._record_changes(conn, [game_id])
+        return cursor.rowcount > 0
+
+    def catalog_version(self):
+        return self.connection().execute('SELECT COALESCE(MAX(version), 0) FROM catalog_changes').fetchone()[0]
+
+    def changes_since(self, version):
+        # Текущую версию читаем первой: изменения после нее попадут в следующий ответ
+        current = self.catalog_version()
+        rows = self.connection().execute(
+            'SELECT game_id, deleted FROM catalog_changes WHERE version > ? AND version <= ?', (version, current))
+        return current, {row['game_id']: bool(row['deleted']) for row in rows}
+
+
+class _Transaction:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+def import_json(db_path, users_file, games_file, likes_file=None):
+    """Однократно переносит данные JSON хранилища в базу SQLite (id сохраняются).
+
+    Перед чтением журнал событий (events.jsonl) сворачивается в снимок под
+    блокировкой файла игр, поэтому еще не свернутые запуски, лайки и
+    комментарии не теряются. Если журнал свернуть не удалось, бросает StorageError.
+    """
+    source = JsonBackend(users_file, games_file, likes_file=likes_file)
+    with source._transaction():
+        if not source.compact():
+            raise StorageError(f"Не удалось свернуть журнал {source.events.filename}")
+        identity = source.events.identity()
+        if identity and identity[1]:
+            raise StorageError(f"Журнал {source.events.filename} не пуст после сжатия, импорт отменен")
+        users = source.users.load()
+        games = source.list_games()
+        # В индексе лайков - и likes.json, и старое поле liked_by
+        liked = {record['game_id']: set(record['user_ids']) for record in source.like_index.records()}
+
+    backend = SqliteBackend(db_path)
+    with backend.transaction() as conn:
+        for user in users:
+            conn.execute('INSERT OR REPLACE INTO users (id, username, password, created_at, last_login) '
+                         'VALUES (?, ?, ?, ?, ?)',
+                         (user['id'], *(user.get(column) for column in USER_COLUMNS)))
+        for game in games:
+            columns, extra = backend._split_fields(game)
+            liked_by = liked.get(game['id'], set())
+            columns['likes'] = len(liked_by)
+            names = ['id'] + list(columns) + ['extra']
+            conn.execute(f"INSERT OR REPLACE INTO games ({', '.join(names)}) "
+                         f"VALUES ({', '.join('?' * len(names))})",
+                         (game['id'], *columns.values(), json.dumps(extra, ensure_ascii=False)))
+            conn.execute('DELETE FROM comments WHERE game_id = ?', (game['id'],))
+            conn.execute('DELETE FROM likes WHERE game_id = ?', (game['id'],))
+            for comment in game.get('comments', []):
+                conn.execute('INSERT OR REPLACE INTO comments (game_id, id, user, user_id, text, timestamp) '
+                             'VALUES (?, ?, ?, ?, ?, ?)',
+                             (game['id'], comment['id'], comment.get('user'), comment.get('user_id'),
+                              comment.get('text'), comment.get('timestamp')))
+            conn.executemany('INSERT INTO likes (game_id, user_id) VALUES (?, ?)',
+                             [(game['id'], user_id) for user_id in liked_by])
+        backend._record_changes(conn, [game['id'] for game in games])
+
+    print(f"Импортировано: {len(users)} пользователей, {len(games)} игр -> {db_path}")
+
+
+if __name__ == '__main__':
+    # python sqlite_storage.py [data_dir]
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+    import_json(os.path.join(data_dir, 'gameform.db'),
+                os.path.join(data_dir, 'users.json'),
+                os.path.join(data_dir, 'games.json'))
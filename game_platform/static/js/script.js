@@ -31,6 +31,15 @@ function initializeEventListeners() {
         commentForm.addEventListener('submit', handleCommentSubmit);
     }
 
+    // Игры, которые еще обрабатываются после загрузки
+    document.querySelectorAll('.processing-badge[data-job-id]').forEach(watchProcessingJob);
+
+    // Подсказки в строке поиска
+    const searchInput = document.getElementById('searchInput');
+    if (searchInput) {
+        searchInput.addEventListener('input', handleSearchInput);
+    }
+
     // Анимация карточек при скролле
     initializeScrollAnimations();
 }
@@ -161,7 +170,7 @@ function handleCommentClick(event) {
     modal.show();
 }
 
-// Загрузка комментариев
+// Загрузка комментариев (по страницам)
 async function loadComments(gameId) {
     const commentsList = document.getElementById('commentsList');
     commentsList.innerHTML = `
@@ -172,16 +181,11 @@ async function loadComments(gameId) {
     `;
 
     try {
-        const response = await fetch('/api/games');
-        if (!response.ok) {
-            throw new Error('Network response was not ok');
-        }
-        const games = await response.json();
-        const game = games.find(g => g.id == gameId);
+        const page = await fetchCommentsPage(gameId, null);
 
         commentsList.innerHTML = '';
 
-        if (!game || !game.comments || game.comments.length === 0) {
+        if (page.comments.length === 0) {
             commentsList.innerHTML = `
                 <div class="text-center text-muted py-5">
                     <i class="fas fa-comments fa-3x mb-3 opacity-50"></i>
@@ -190,12 +194,7 @@ async function loadComments(gameId) {
                 </div>
             `;
         } else {
-            game.comments.forEach((comment, index) => {
-                setTimeout(() => {
-                    const commentDiv = createCommentElement(comment, gameId);
-                    commentsList.appendChild(commentDiv);
-                }, index * 100);
-            });
+            appendComments(commentsList, page, gameId);
         }
     } catch (error) {
         console.error('Error loading comments:', error);
@@ -208,6 +207,48 @@ async function loadComments(gameId) {
     }
 }
 
+// Одна страница комментариев игры
+async function fetchCommentsPage(gameId, cursor) {
+    const params = new URLSearchParams({ limit: 50 });
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+    const response = await fetch(`/api/games/${gameId}/comments?${params}`);
+    if (!response.ok) {
+        throw new Error('Network response was not ok');
+    }
+    return response.json();
+}
+
+// Добавляет комментарии страницы и кнопку загрузки следующей
+function appendComments(commentsList, page, gameId) {
+    page.comments.forEach((comment, index) => {
+        setTimeout(() => {
+            const commentDiv = createCommentElement(comment, gameId);
+            commentsList.insertBefore(commentDiv, commentsList.querySelector('.load-more-comments'));
+        }, index * 100);
+    });
+
+    if (page.next_cursor) {
+        const moreBtn = document.createElement('button');
+        moreBtn.className = 'btn btn-outline-primary btn-sm w-100 load-more-comments';
+        moreBtn.innerHTML = '<i class="fas fa-chevron-down me-1"></i> Показать еще';
+        moreBtn.addEventListener('click', async () => {
+            moreBtn.disabled = true;
+            try {
+                const nextPage = await fetchCommentsPage(gameId, page.next_cursor);
+                moreBtn.remove();
+                appendComments(commentsList, nextPage, gameId);
+            } catch (error) {
+                console.error('Error loading comments:', error);
+                moreBtn.disabled = false;
+                showNotification('Ошибка загрузки комментариев', 'error');
+            }
+        });
+        commentsList.appendChild(moreBtn);
+    }
+}
+
 // Создание элемента комментария
 function createCommentElement(comment, gameId) {
     const commentDiv = document.createElement('div');
@@ -351,21 +392,74 @@ async function handleCommentSubmit(event) {
 
 // Обновление счетчика комментариев
 function updateCommentsCount(gameId) {
-    fetch('/api/games')
+    fetch(`/api/games/${gameId}?fields=comments_count`)
         .then(response => response.json())
-        .then(games => {
-            const game = games.find(g => g.id == gameId);
-            if (game) {
+        .then(game => {
+            if (game.comments_count !== undefined) {
                 document.querySelectorAll(`.comment-btn[data-game-id="${gameId}"]`).forEach(btn => {
                     const countSpan = btn.querySelector('.comments-count');
                     if (countSpan) {
-                        animateCounter(countSpan, game.comments.length);
+                        animateCounter(countSpan, game.comments_count);
                     }
                 });
             }
         });
 }
 
+// Опрос состояния фоновой обработки загруженной игры
+function watchProcessingJob(badge) {
+    const poll = async () => {
+        try {
+            const response = await fetch(`/api/jobs/${badge.dataset.jobId}`);
+            if (response.status === 404) {
+                badge.remove();
+                return;
+            }
+            const job = await response.json();
+            if (job.status === 'done') {
+                badge.remove();
+                return;
+            }
+            if (job.status === 'failed') {
+                badge.classList.replace('bg-secondary', 'bg-warning');
+                badge.textContent = 'Ошибка обработки';
+                return;
+            }
+        } catch (error) {
+            console.error('Error loading job status:', error);
+        }
+        setTimeout(poll, 3000);
+    };
+    setTimeout(poll, 1000);
+}
+
+// Подсказки поиска (с задержкой, чтобы не отправлять запрос на каждую букву)
+let searchSuggestTimer = null;
+
+function handleSearchInput(event) {
+    const query = event.currentTarget.value;
+    clearTimeout(searchSuggestTimer);
+    if (!query.trim()) {
+        return;
+    }
+
+    searchSuggestTimer = setTimeout(async () => {
+        try {
+            const response = await fetch(`/api/search/suggest?q=${encodeURIComponent(query)}`);
+            const data = await response.json();
+            const datalist = document.getElementById('searchSuggestions');
+            datalist.innerHTML = '';
+            data.suggestions.forEach(suggestion => {
+                const option = document.createElement('option');
+                option.value = suggestion.title;
+                datalist.appendChild(option);
+            });
+        } catch (error) {
+            console.error('Error loading suggestions:', error);
+        }
+    }, 200);
+}
+
 // Поделиться игрой
 function handleShare(event) {
     event.preventDefault();
@@ -0,0 +1,696 @@
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from background import BackgroundThreads
+from changes import ChangeLog
+from eventlog import EventLog
+from likes import LikeIndex
+from metrics import counter, histogram
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+JSON_READ_SECONDS = histogram('gameform_json_read_seconds', 'Чтение JSON файла с диска', ('file',))
+JSON_PARSE_SECONDS = histogram('gameform_json_parse_seconds', 'Разбор JSON файла', ('file',))
+JSON_WRITE_SECONDS = histogram('gameform_json_write_seconds', 'Запись JSON файла целиком (с fsync)', ('file',))
+JSON_BYTES_WRITTEN = counter('gameform_json_bytes_written_total', 'Байт записано в JSON файлы', ('file',))
+
+
+class StorageError(Exception):
+    """Файл данных поврежден или не читается"""
+
+
+class FileLock:
+    """Межпроцессная блокировка файла данных через соседний файл .lock.
+
+    Повторный захват тем же потоком не блокируется, поэтому save_json
+    можно вызывать внутри уже открытой транзакции.
+    """
+
+    _locks = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, filename):
+        self.path = filename + '.lock'
+        self._local = threading.local()
+
+    @classmethod
+    def for_file(cls, filename):
+        filename = os.path.abspath(filename)
+        with cls._locks_guard:
+            if filename not in cls._locks:
+                cls._locks[filename] = cls(filename)
+            return cls._locks[filename]
+
+    def acquire(self):
+        depth = getattr(self._local, 'depth', 0)
+        if depth == 0:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            handle = open(self.path, 'a+b')
+            if fcntl:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+            self._local.handle = handle
+        self._local.depth = depth + 1
+
+    def release(self):
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            handle = self._local.handle
+            if fcntl:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+            handle.close()
+            self._local.handle = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+def file_lock(filename):
+    """Блокировка для цикла чтение-изменение-запись файла"""
+    return FileLock.for_file(filename)
+
+
+def load_json(filename):
+    """Загружает JSON из файла с обработкой ошибок.
+
+    Поврежденный файл не перезаписывается: его копия сохраняется рядом
+    с суффиксом .corrupt, а вызывающий код получает StorageError.
+    """
+    if not os.path.exists(filename):
+        print(f"Создаем новый файл: {filename}")
+        save_json(filename, [])
+        return []
+
+    name = os.path.basename(filename)
+    try:
+        with JSON_READ_SECONDS.time(file=name):
+            with open(filename, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+        if not content:
+            return []
+        with JSON_PARSE_SECONDS.time(file=name):
+            return json.loads(content)
+
+    except (json.JSONDecodeError, UnicodeDecodeError, OSError) as e:
+        print(f"Ошибка загрузки {filename}: {e}")
+        backup = f"{filename}.corrupt-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        with contextlib.suppress(OSError):
+            shutil.copy2(filename, backup)
+            print(f"Копия поврежденного файла: {backup}")
+        raise StorageError(f"Не удалось прочитать {filename}: {e}") from e
+
+
+def _read_umask():
+    # umask можно узнать, только установив новый: возвращаем прежний сразу же
+    mask = os.umask(0o022)
+    os.umask(mask)
+    return mask
+
+
+# Права новых файлов как у open(): 0666 без битов umask. mkstemp создает файлы
+# с правами 0600, и static тогда не прочитал бы веб-сервер другого пользователя
+FILE_MODE = 0o666 & ~_read_umask()
+
+
+def set_file_mode(fd):
+    """Ставит временному файлу из mkstemp права FILE_MODE перед переименованием"""
+    if hasattr(os, 'fchmod'):  # на Windows права не переносятся
+        os.fchmod(fd, FILE_MODE)
+
+
+def write_atomic(filename, write):
+    """Пишет файл через временный файл и os.replace: читатели видят либо старую, либо новую версию"""
+    directory = os.path.dirname(filename) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(filename)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            set_file_mode(f.fileno())
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filename)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+def save_json(filename, data):
+    """Сохраняет данные в JSON файл (атомарно и под блокировкой)"""
+    name = os.path.basename(filename)
+    try:
+        with file_lock(filename):
+            started = time.perf_counter()
+            write_atomic(filename, lambda f: json.dump(data, f, ensure_ascii=False, indent=2))
+            JSON_WRITE_SECONDS.observe(time.perf_counter() - started, file=name)
+            JSON_BYTES_WRITTEN.inc(os.path.getsize(filename), file=name)
+        return True
+    except Exception as e:
+        print(f"Ошибка сохранения {filename}: {e}")
+        return False
+
+
+def file_signature(filename):
+    """Возвращает (inode, mtime, размер) файла или None, если файла нет"""
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class JsonRepository:
+    """Кэш разобранного JSON файла в памяти процесса.
+
+    Файл перечитывается только при изменении его mtime или размера,
+    запись идет через save_json и сразу обновляет кэш. Изменения данных
+    выполняются внутри transaction(), которая блокирует файл для других
+    процессов и перед изменением подтягивает их записи.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._data = None
+        self._signature = None
+        self.generation = 0  # растет при каждом перечитывании файла
+        self.lock = threading.RLock()
+
+    def load(self):
+        """Возвращает закэшированные данные, перечитывая файл при его изменении"""
+        with self.lock:
+            signature = file_signature(self.filename)
+            if self._data is None or signature != self._signature:
+                try:
+                    data = load_json(self.filename)
+                except StorageError:
+                    if self._data is None:
+                        raise
+                    # Оставляем последнюю корректную версию
+                    return self._data
+                self._data = data
+                self._signature = signature
+                self.generation += 1
+                self._reindex()
+            return self._data
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Блокирует файл (в том числе для других процессов) на время чтения-изменения-записи"""
+        with self.lock, file_lock(self.filename):
+            self.load()
+            yield self
+
+    def save(self, data=None):
+        """Сохраняет данные на диск и обновляет кэш"""
+        with self.lock:
+            if data is None:
+                data = self.load()
+            if save_json(self.filename, data):
+                if data is not self._data:
+                    self._data = data
+                    self._reindex()
+                self._signature = file_signature(self.filename)
+                return True
+            self.invalidate()
+            return False
+
+    def invalidate(self):
+        """Сбрасывает кэш, следующее чтение пойдет с диска"""
+        with self.lock:
+            self._data = None
+            self._signature = None
+
+    def _reindex(self):
+        """Вызывается после загрузки новых данных, переопределяется наследниками"""
+
+
+class IndexedRepository(JsonRepository):
+    """Кэшированный список записей с индексами по полям.
+
+    unique - поля с уникальными значениями (id, username), поиск за O(1).
+    groups - поля для группировки (creator_id), возвращают список записей.
+    Индексы перестраиваются при перечитывании файла и обновляются через add/remove.
+    """
+
+    def __init__(self, filename, unique=('id',), groups=()):
+        self.unique = tuple(unique)
+        self.groups = tuple(groups)
+        self._unique_index = {field: {} for field in self.unique}
+        self._group_index = {field: {} for field in self.groups}
+        self._max_id = 0
+        super().__init__(filename)
+
+    def _reindex(self):
+        self._unique_index = {field: {} for field in self.unique}
+        self._group_index = {field: {} for field in self.groups}
+        self._max_id = 0
+        for record in self._data or []:
+            self._index_record(record)
+
+    def _index_record(self, record):
+        for field in self.unique:
+            if field in record:
+                self._unique_index[field][record[field]] = record
+        for field in self.groups:
+            if field in record:
+                self._group_index[field].setdefault(record[field], []).append(record)
+        if isinstance(record.get('id'), int):
+            self._max_id = max(self._max_id, record['id'])
+
+    def _unindex_record(self, record):
+        for field in self.unique:
+            index = self._unique_index[field]
+            if index.get(record.get(field)) is record:
+                del index[record[field]]
+        for field in self.groups:
+            bucket = self._group_index[field].get(record.get(field))
+            if bucket:
+                bucket[:] = [r for r in bucket if r is not record]
+                if not bucket:
+                    del self._group_index[field][record[field]]
+
+    def get(self, field, value):
+        """Находит запись по уникальному полю"""
+        with self.lock:
+            self.load()
+            return self._unique_index[field].get(value)
+
+    def lookup(self, field, value):
+        """Как get, но без проверки файла на диске (для использования внутри load/replay)"""
+        return self._unique_index[field].get(value)
+
+    def group(self, field, value):
+        """Возвращает записи с заданным значением поля группировки"""
+        with self.lock:
+            self.load()
+            return list(self._group_index[field].get(value, []))
+
+    def next_id(self):
+        """Следующий свободный id (не повторяет id удаленных записей)"""
+        with self.lock:
+            self.load()
+            return self._max_id + 1
+
+    def add(self, record):
+        """Добавляет запись в кэш и индексы (на диск попадет при save)"""
+        with self.lock:
+            self.load().append(record)
+            self._index_record(record)
+
+    def remove(self, record):
+        """Удаляет запись из кэша и индексов (на диск попадет при save)"""
+        with self.lock:
+            data = self.load()
+            data[:] = [r for r in data if r is not record]
+            self._unindex_record(record)
+
+
+class StorageBackend:
+    """Интерфейс хранилища пользователей и игр.
+
+    Маршруты работают только через эти методы, поэтому JSON файлы
+    можно заменить другой реализацией (см. sqlite_storage.py).
+    Методы записи возвращают None/False, если данные не удалось сохранить.
+    """
+
+    def count_users(self):
+        raise NotImplementedError
+
+    def get_user_by_username(self, username):
+        raise NotImplementedError
+
+    def add_user(self, user):
+        """Добавляет пользователя и возвращает его запись с присвоенным id"""
+        raise NotImplementedError
+
+    def update_user(self, user_id, fields):
+        raise NotImplementedError
+
+    def list_games(self):
+        """Все игры вместе с комментариями (лайки - через is_liked/liked_game_ids)"""
+        raise NotImplementedError
+
+    def get_game(self, game_id):
+        raise NotImplementedError
+
+    def games_by_creator(self, creator_id):
+        raise NotImplementedError
+
+    def add_game(self, game):
+        """Добавляет игру и возвращает ее запись с присвоенным id"""
+        raise NotImplementedError
+
+    def update_game(self, game_id, fields, touch=True):
+        """Меняет поля игры; touch=False не обновляет updated_at (служебные поля)"""
+        raise NotImplementedError
+
+    def delete_game(self, game_id):
+        raise NotImplementedError
+
+    def increment_plays(self, game_id, amount=1):
+        """Увеличивает счетчик запусков, возвращает новое значение"""
+        raise NotImplementedError
+
+    def toggle_like(self, game_id, user_id):
+        """Ставит или снимает лайк, возвращает (likes, is_liked)"""
+        raise NotImplementedError
+
+    def is_liked(self, game_id, user_id):
+        raise NotImplementedError
+
+    def liked_game_ids(self, user_id):
+        """Множество id игр, которые лайкнул пользователь"""
+        raise NotImplementedError
+
+    def apply_counters(self, plays, likes):
+        """Применяет пачку изменений одной записью.
+
+        plays - {game_id: прирост запусков}, likes - {game_id: {user_id: True/False}}.
+        Игры, которых уже нет, пропускаются.
+        """
+        raise NotImplementedError
+
+    def add_comment(self, game_id, comment):
+        """Добавляет комментарий и возвращает его с присвоенным id"""
+        raise NotImplementedError
+
+    def delete_comment(self, game_id, comment_id):
+        raise NotImplementedError
+
+    def catalog_version(self):
+        """Номер версии каталога игр, растет при каждом изменении игры"""
+        raise NotImplementedError
+
+    def changes_since(self, version):
+        """Изменения после версии: (текущая версия, {game_id: удалена ли игра})"""
+        raise NotImplementedError
+
+
+def now_iso():
+    return datetime.now().isoformat()
+
+
+class JsonBackend(StorageBackend):
+    """Хранилище на JSON файлах.
+
+    Пользователи, новые игры и правки игр переписывают файл целиком.
+    Запуски, лайки и комментарии дописываются в журнал событий (events.jsonl),
+    а games.json служит снимком: состояние = снимок + хвост журнала.
+    События хранят итоговые значения, поэтому их повторное применение
+    к снимку безопасно. Фоновый поток периодически сворачивает журнал в снимок.
+    Версия каталога ведется в отдельном журнале изменений (changes.jsonl),
+    лайки - в отдельном файле (likes.json), а likes в записи игры - их число.
+    """
+
+    def __init__(self, users_file, games_file, events_file=None,
+                 compact_interval=60.0, compact_bytes=1024 * 1024, changes_file=None, likes_file=None):
+        self.users = IndexedRepository(users_file, unique=('id', 'username'))
+        self.games = IndexedRepository(games_file, unique=('id',), groups=('creator_id',))
+        self.events = EventLog(events_file or os.path.join(os.path.dirname(games_file), 'events.jsonl'))
+        self.changes = ChangeLog(changes_file or os.path.join(os.path.dirname(games_file), 'changes.jsonl'))
+        self.like_records = JsonRepository(likes_file or os.path.join(os.path.dirname(games_file), 'likes.json'))
+        self.like_index = LikeIndex()
+        self._legacy_likes = []  # лайки из старого поля liked_by, еще не записанные в likes.json
+        self._games_generation = None
+        self.compact_interval = compact_interval
+        self.compact_bytes = compact_bytes
+        self._log_state = None
+        self._log_offset = 0
+        self._wake = threading.Event()
+        self._compactor = BackgroundThreads(self._run_compactor, 'event-log-compactor')
+
+    # Пользователи
+
+    def count_users(self):
+        return len(self.users.load())
+
+    def get_user_by_username(self, username):
+        return self.users.get('username', username)
+
+    def add_user(self, user):
+        with self.users.transaction():
+            user = dict(user, id=self.users.next_id())
+            self.users.add(user)
+            return user if self.users.save() else None
+
+    def update_user(self, user_id, fields):
+        with self.users.transaction():
+            user = self.users.get('id', user_id)
+            if not user:
+                return False
+            user.update(fields)
+            return self.users.save()
+
+    # Снимок и журнал событий
+
+    def _sync(self):
+        """Подтягивает снимок и еще не примененный хвост журнала"""
+        with self.games.lock:
+            games = self.games.load()
+            like_records = self.like_records.load()
+            identity = self.events.identity()
+            state = (self.games.generation, self.like_records.generation, identity[0] if identity else None)
+            if state != self._log_state:
+                # Новый снимок или сжатый журнал: применяем журнал с начала
+                self._log_state = state
+                self._log_offset = 0
+                self._load_likes(games, like_records)
+            if identity and identity[1] > self._log_offset:
+                events, self._log_offset = self.events.read_from(self._log_offset)
+                for event in events:
+                    self._apply_event(event)
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self.games.transaction():
+            self._sync()
+            yield
+
+    def _load_likes(self, games, like_records):
+        if self.games.generation != self._games_generation:
+            # Раньше лайки хранились в записи игры: убираем их оттуда и держим
+            # отдельно, пока следующий снимок не запишет их в likes.json
+            self._games_generation = self.games.generation
+            self._legacy_likes = [{'game_id': game['id'], 'user_ids': game.pop('liked_by')}
+                                  for game in games if 'liked_by' in game]
+        self.like_index.clear()
+        self.like_index.load(like_records)
+        self.like_index.load(self._legacy_likes)
+        for game in games:
+            game['likes'] = self.like_index.count(game['id'])
+
+    def _apply_event(self, event):
+        game = self.games.lookup('id', event.get('game_id'))
+        if not game:
+            return
+        kind = event.get('type')
+        if kind == 'plays':
+            game['plays'] = event['plays']
+        elif kind == 'like':
+            self.like_index.set(game['id'], event['user_id'], event['liked'])
+            game['likes'] = self.like_index.count(game['id'])
+        elif kind == 'comment':
+            comments = game.setdefault('comments', [])
+            if not any(c.get('id') == event['comment']['id'] for c in comments):
+                comments.append(event['comment'])
+        elif kind == 'delete_comment':
+            game['comments'] = [c for c in game.get('comments', []) if c.get('id') != event['comment_id']]
+        game['updated_at'] = max(game.get('updated_at') or '', event.get('updated_at') or '')
+
+    def _record(self, events):
+        """Дописывает события в журнал и применяет их (вызывать внутри _transaction)"""
+        try:
+            self.events.append(events)
+        except OSError as e:
+            print(f"Ошибка записи журнала {self.events.filename}: {e}")
+            return False
+        self._sync()
+        self.changes.record(event['game_id'] for event in events)
+        self._compactor.ensure()
+        identity = self.events.identity()
+        if identity and identity[1] >= self.compact_bytes:
+            self._wake.set()
+        return True
+
+    def _save_snapshot(self):
+        """Записывает likes.json и games.json целиком и очищает журнал (вызывать внутри _transaction)"""
+        if not self.like_records.save(self.like_index.records()):
+            return False
+        self._legacy_likes = []
+        if not self.games.save():
+            return False
+        try:
+            self.events.reset()
+        except OSError as e:
+            # Не страшно: события журнала уже учтены в снимке и применятся повторно без изменений
+            print(f"Ошибка очистки журнала {self.events.filename}: {e}")
+        return True
+
+    def compact(self):
+        """Сворачивает журнал событий в games.json"""
+        with self._transaction():
+            identity = self.events.identity()
+            if not identity or identity[1] == 0:
+                return True
+            return self._save_snapshot()
+
+    def _run_compactor(self):
+        while True:
+            self._wake.wait(self.compact_interval)
+            self._wake.clear()
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Ошибка сжатия журнала: {e}")
+
+    # Игры
+
+    def list_games(self):
+        self._sync()
+        return self.games.load()
+
+    def get_game(self, game_id):
+        self._sync()
+        return self.games.get('id', game_id)
+
+    def games_by_creator(self, creator_id):
+        self._sync()
+        return self.games.group('creator_id', creator_id)
+
+    def add_game(self, game):
+        with self._transaction():
+            game = dict(game, id=self.games.next_id())
+            self.games.add(game)
+            if not self._save_snapshot():
+                return None
+            self.changes.record([game['id']])
+            return game
+
+    def update_game(self, game_id, fields, touch=True):
+        with self._transaction():
+            game = self.games.get('id', game_id)
+            if not game:
+                return False
+            game.update(fields)
+            if touch:
+                game['updated_at'] = now_iso()
+            if not self._save_snapshot():
+                return False
+            self.changes.record([game_id])
+            return True
+
+    def delete_game(self, game_id):
+        with self._transaction():
+            game = self.games.get('id', game_id)
+            if not game:
+                return False
+            self.games.remove(game)
+            self.like_index.drop_game(game_id)
+            if not self._save_snapshot():
+                return False
+            self.changes.record([game_id], deleted=True)
+            return True
+
+    def increment_plays(self, game_id, amount=1):
+        with self._transaction():
+            if not self.games.get('id', game_id) or not self.apply_counters({game_id: amount}, {}):
+                return None
+            return self.games.lookup('id', game_id)['plays']
+
+    def toggle_like(self, game_id, user_id):
+        with self._transaction():
+            game = self.games.get('id', game_id)
+            if not game:
+                return None
+            is_liked = not self.like_index.is_liked(game_id, user_id)
+            event = {'type': 'like', 'game_id': game_id, 'user_id': user_id,
+                     'liked': is_liked, 'updated_at': now_iso()}
+            if not self._record([event]):
+                return None
+            return game['likes'], is_liked
+
+    def is_liked(self, game_id, user_id):
+        self._sync()
+        return self.like_index.is_liked(game_id, user_id)
+
+    def liked_game_ids(self, user_id):
+        self._sync()
+        return self.like_index.games_liked_by(user_id)
+
+    def apply_counters(self, plays, likes):
+        with self._transaction():
+            now = now_iso()
+            events = []
+            for game_id, amount in plays.items():
+                game = self.games.get('id', game_id)
+                if game:
+                    events.append({'type': 'plays', 'game_id': game_id,
+                                   'plays': game.get('plays', 0) + amount, 'updated_at': now})
+            for game_id, changes in likes.items():
+                if self.games.get('id', game_id):
+                    events.extend({'type': 'like', 'game_id': game_id, 'user_id': user_id,
+                                   'liked': liked, 'updated_at': now}
+                                  for user_id, liked in changes.items())
+            return self._record(events)
+
+    def add_comment(self, game_id, comment):
+        with self._transaction():
+            game = self.games.get('id', game_id)
+            if not game:
+                return None
+            comments = game.get('comments', [])
+            comment = dict(comment, id=max((c.get('id', 0) for c in comments), default=0) + 1)
+            event = {'type': 'comment', 'game_id': game_id, 'comment': comment, 'updated_at': now_iso()}
+            return comment if self._record([event]) else None
+
+    def delete_comment(self, game_id, comment_id):
+        with self._transaction():
+            if not self.games.get('id', game_id):
+                return False
+            event = {'type': 'delete_comment', 'game_id': game_id,
+                     'comment_id': comment_id, 'updated_at': now_iso()}
+            return self._record([event])
+
+    def catalog_version(self):
+        return self.changes.version()
+
+    def changes_since(self, version):
+        return self.changes.changes_since(version)
+
+
+def create_backend(data_dir, kind='json', sqlite_path=None, compact_interval=60.0, compact_bytes=1024 * 1024):
+    """Создает хранилище kind (json или sqlite) в папке data_dir.
+
+    sqlite_path - файл базы (по умолчанию data_dir/gameform.db);
+    compact_interval и compact_bytes - когда сворачивать журнал событий JSON хранилища.
+    """
+    if kind.lower() == 'sqlite':
+        from sqlite_storage import SqliteBackend
+        return SqliteBackend(sqlite_path or os.path.join(data_dir, 'gameform.db'))
+    return JsonBackend(os.path.join(data_dir, 'users.json'),
+                       os.path.join(data_dir, 'games.json'),
+                       os.path.join(data_dir, 'events.jsonl'),
+                       compact_interval=compact_interval,
+                       compact_bytes=compact_bytes)
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Приложение с пустой папкой данных; задачи и сброс счетчиков не запускаются сами"""
+    application = app_module.create_app({
+        'TESTING': True,
+        'DATA_DIR': str(tmp_path),
+        'CHANGE_BUS': 'local',
+        'JOB_WORKERS': 0,
+        'COUNTER_FLUSH_INTERVAL': 3600,
+        'COUNTER_FLUSH_THRESHOLD': 1000,
+    })
+    yield application
+    app_module.storage.flush()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def game(app):
+    """Игра с существующим HTML из static/games"""
+    games_dir = os.path.join(app_module.STATIC_DIR, 'games')
+    html_file = 'games/' + min(name for name in os.listdir(games_dir) if name.endswith('.html'))
+    return app_module.storage.add_game({
+        'title': 'Тестовая игра', 'creator': 'tester', 'creator_id': 1, 'description': '',
+        'category': 'Аркады', 'html_file': html_file, 'cover_image': 'images/none.png',
+        'thumbnails': {}, 'status': 'ready', 'likes': 0, 'plays': 0, 'comments': [],
+        'created_at': '2025-01-01T00:00:00', 'updated_at': '2025-01-01T00:00:00',
+    })
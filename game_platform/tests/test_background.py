@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+from background import BackgroundThreads
+from metrics import SamplingProfiler
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'register_at_fork'), reason='нужен fork')
+
+
+def test_threads_start_once_per_process():
+    started = []
+    done = threading.Event()
+
+    def run():
+        started.append(threading.current_thread().name)
+        done.wait(5)
+
+    threads = BackgroundThreads(run, 'test-worker', count=2)
+    assert threads.ensure()
+    assert not threads.ensure()
+    done.set()
+    assert sorted(thread.name for thread in threads._threads) == ['test-worker-0', 'test-worker-1']
+
+
+def test_threads_restart_after_fork():
+    queue = multiprocessing.get_context('fork').SimpleQueue()
+    stop = threading.Event()
+    threads = BackgroundThreads(lambda: (queue.put(os.getpid()), stop.wait(5)), 'test-fork')
+    threads.ensure()
+    assert queue.get() == os.getpid()
+
+    def child():
+        # Поток родителя в этом процессе не существует: ensure() запускает свой
+        os._exit(0 if threads.ensure() and queue.get() == os.getpid() else 1)
+
+    process = multiprocessing.get_context('fork').Process(target=child)
+    process.start()
+    process.join(10)
+    stop.set()
+    assert process.exitcode == 0
+
+
+def test_profiler_samples_in_forked_worker():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    profiler.stop()
+
+    def child():
+        profiler.start()
+        deadline = time.time() + 0.2
+        while time.time() < deadline:
+            sum(range(1000))
+        os._exit(0 if profiler.stop() else 1)
+
+    process = multiprocessing.get_context('fork').Process(target=child)
+    process.start()
+    process.join(10)
+    assert process.exitcode == 0
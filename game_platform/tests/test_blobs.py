@@ -0,0 +1,44 @@
+import io
+import os
+
+from werkzeug.datastructures import FileStorage
+
+from blobs import BlobStore
+from uploads import ingest_upload
+
+
+def upload(blob_store, content):
+    games = os.path.join(blob_store.static_dir, 'games')
+    result = ingest_upload(FileStorage(io.BytesIO(content), filename='game.html'), games,
+                           suffix='.html', blob_store=blob_store)
+    return 'games/' + os.path.basename(result.path)
+
+
+def refs(blob_store, path):
+    record = blob_store.refs.get('path', path)
+    return record['refs'] if record else 0
+
+
+def test_duplicate_upload_takes_reference_with_the_file(tmp_path):
+    blob_store = BlobStore(str(tmp_path), str(tmp_path / 'blobs.json'))
+    first = upload(blob_store, b'<html>same</html>')
+    second = upload(blob_store, b'<html>same</html>')
+    assert first == second and refs(blob_store, first) == 2
+    assert [name for name in (tmp_path / 'games').iterdir() if name.name.startswith('.upload-')] == []
+
+    # Освобождение ссылки первой игры не удаляет файл второй
+    blob_store.release(first)
+    assert (tmp_path / first).exists()
+    blob_store.release(second)
+    assert not (tmp_path / first).exists()
+
+
+def test_upload_after_last_release_stores_the_file_again(tmp_path):
+    blob_store = BlobStore(str(tmp_path), str(tmp_path / 'blobs.json'))
+    path = upload(blob_store, b'<html>again</html>')
+    blob_store.release(path)
+    assert not (tmp_path / path).exists()
+
+    assert upload(blob_store, b'<html>again</html>') == path
+    assert (tmp_path / path).read_bytes() == b'<html>again</html>'
+    assert refs(blob_store, path) == 1
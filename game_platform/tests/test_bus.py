@@ -0,0 +1,58 @@
+import json
+import multiprocessing
+
+import pytest
+
+from bus import ALL, FileChangeBus
+
+pytestmark = pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='нужен fork')
+
+
+def publish_many(filename, count):
+    bus = FileChangeBus(filename, max_bytes=4096)
+    for game_id in range(count):
+        bus.publish('game', game_id)
+
+
+def test_messages_from_other_processes_are_delivered(tmp_path):
+    filename = str(tmp_path / 'bus.jsonl')
+    reader = FileChangeBus(filename)
+    received = []
+    reader.subscribe(lambda entity, entity_id: received.append((entity, entity_id)))
+    reader.poll()
+
+    process = multiprocessing.get_context('fork').Process(target=publish_many, args=(filename, 3))
+    process.start()
+    process.join()
+
+    reader.poll()
+    assert received == [('game', 0), ('game', 1), ('game', 2)]
+
+
+def test_concurrent_compaction_keeps_log_readable(tmp_path, capfd):
+    filename = str(tmp_path / 'bus.jsonl')
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=publish_many, args=(filename, 300)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    assert 'Ошибка записи уведомления' not in capfd.readouterr().out
+    assert not (tmp_path / 'bus.jsonl.tmp').exists()
+    with open(filename, encoding='utf-8') as f:
+        assert all(json.loads(line)['entity'] == 'game' for line in f)
+
+
+def test_reader_gets_all_after_log_is_replaced(tmp_path):
+    filename = str(tmp_path / 'bus.jsonl')
+    FileChangeBus(filename).publish('game', 1)
+    reader = FileChangeBus(filename)
+    received = []
+    reader.subscribe(lambda entity, entity_id: received.append(entity))
+    reader.poll()
+
+    FileChangeBus(filename, max_bytes=1).publish('game', 2)  # журнал сразу заменяется пустым
+    reader.poll()
+    assert received == [ALL]
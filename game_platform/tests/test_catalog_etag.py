@@ -0,0 +1,54 @@
+def register(client, username='player'):
+    client.post('/register', data={'username': username, 'password': 'secret'})
+
+
+def etag_of(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return response.headers['ETag'], response.get_json()
+
+
+def test_like_changes_etag_before_flush(client, game):
+    register(client)
+    etag, body = etag_of(client, f"/api/games/{game['id']}")
+    assert body['likes'] == 0
+
+    assert client.get(f"/like/{game['id']}").get_json()['success']
+
+    new_etag, body = etag_of(client, f"/api/games/{game['id']}")
+    assert new_etag != etag
+    assert body['likes'] == 1
+    response = client.get(f"/api/games/{game['id']}", headers={'If-None-Match': etag})
+    assert response.status_code == 200
+
+
+def test_play_changes_etag_before_flush(client, game):
+    etag, body = etag_of(client, '/api/games')
+    client.get(f"/play/{game['id']}")
+
+    new_etag, body = etag_of(client, '/api/games')
+    assert new_etag != etag
+    assert body['games'][0]['plays'] == 1
+
+
+def test_changes_feed_includes_buffered_counters(app, client, game):
+    import app as app_module
+
+    version = client.get('/api/games/changes').get_json()['version']
+    client.get(f"/play/{game['id']}")
+
+    body = client.get(f"/api/games/changes?since={version}").get_json()
+    assert [changed['id'] for changed in body['games']] == [game['id']]
+    assert body['games'][0]['plays'] == 1
+
+    # После сброса изменение остается в журнале под новой версией
+    app_module.storage.flush()
+    body = client.get(f"/api/games/changes?since={version}").get_json()
+    assert body['version'] > version
+    assert [changed['id'] for changed in body['games']] == [game['id']]
+
+
+def test_etag_stable_without_changes(client, game):
+    etag, _ = etag_of(client, '/api/games')
+    response = client.get('/api/games', headers={'If-None-Match': etag})
+    assert response.status_code == 304
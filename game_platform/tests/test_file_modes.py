@@ -0,0 +1,42 @@
+import io
+import os
+import stat
+
+from werkzeug.datastructures import FileStorage
+
+from assets import ENCODINGS, StaticAssets
+from optimizer import build_game
+from storage import FILE_MODE, save_json
+from uploads import ingest_upload
+
+
+def mode_of(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_upload_gets_default_file_mode(tmp_path):
+    upload = FileStorage(io.BytesIO(b'<html></html>'), filename='game.html')
+    result = ingest_upload(upload, str(tmp_path), suffix='.html')
+    assert mode_of(result.path) == FILE_MODE
+
+
+def test_build_files_get_default_file_mode(tmp_path):
+    games = tmp_path / 'games'
+    games.mkdir()
+    (games / 'game.html').write_text('<html><body><script>var a = 1;</script></body></html>', encoding='utf-8')
+    build = build_game(str(tmp_path), 'games/game.html')
+    assert mode_of(tmp_path / build['html']) == FILE_MODE
+
+
+def test_json_files_get_default_file_mode(tmp_path):
+    filename = str(tmp_path / 'games.json')
+    assert save_json(filename, [])
+    assert mode_of(filename) == FILE_MODE
+
+
+def test_precompressed_variants_get_default_file_mode(tmp_path):
+    (tmp_path / 'style.css').write_text('body { color: red; }\n' * 200, encoding='utf-8')
+    assets = StaticAssets(str(tmp_path))
+    assert assets.precompress('style.css') > 0
+    variants = [tmp_path / ('style.css' + suffix) for _, suffix in ENCODINGS]
+    assert all(mode_of(path) == FILE_MODE for path in variants if path.exists())
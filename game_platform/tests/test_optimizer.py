@@ -0,0 +1,125 @@
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from optimizer import MinifyError, minify_css, minify_js, optimize_html
+
+
+# Регулярное выражение или деление
+
+def test_division_stays_division():
+    assert minify_js('var a = b / c / d;') == 'var a=b / c / d;'
+    assert minify_js('var x = (a + b) / 2 / c;') == 'var x=(a+b) / 2 / c;'
+    assert minify_js('var y = f(x) / 2;') == 'var y=f(x) / 2;'
+
+
+def test_regex_literals_are_copied_as_is():
+    assert minify_js('var r = /ab+c/gi.test(s);') == 'var r= /ab+c/gi.test(s);'
+    assert minify_js('return /[/]+  x/.test(s)') == 'return /[/]+  x/.test(s)'
+    assert minify_js('var p = s.split(/\\/ +/);') == 'var p=s.split(/\\/ +/);'
+
+
+@pytest.mark.parametrize('keyword', ['if', 'while', 'for', 'with'])
+def test_regex_after_header_keyword(keyword):
+    header = '(;;)' if keyword == 'for' else '(x)'
+    assert minify_js(f'{keyword} {header} /a  b/.test(s);') == f'{keyword}{header} /a  b/.test(s);'
+
+
+def test_division_after_call_inside_header():
+    assert minify_js('if (f(x) / 2 > y) go();') == 'if(f(x) / 2>y)go();'
+
+
+def test_ambiguous_slash_after_brace_is_left_alone():
+    with pytest.raises(MinifyError):
+        minify_js('function f() {}\n/a b/.test(s)')
+    html = '<script>function f() {}\n/a b/.test(s)</script>'
+    assert optimize_html(html)[0] == html
+
+
+def test_unbalanced_parenthesis_is_left_alone():
+    with pytest.raises(MinifyError):
+        minify_js('a = b) / c')
+
+
+# Автоматическая расстановка точек с запятой
+
+def test_newlines_kept_where_asi_depends_on_them():
+    source = 'var a = 1\nvar b = 2\nx = a\n++b\nreturn\nvalue'
+    assert minify_js(source) == 'var a=1\nvar b=2\nx=a\n++b\nreturn\nvalue'
+
+
+def test_newline_from_stripped_comment_is_kept():
+    assert minify_js('a = 1 /* one\n */ b = 2') == 'a=1\nb=2'
+    assert minify_js('a = 1 // one\nb = 2') == 'a=1\nb=2'
+
+
+def test_newlines_dropped_where_asi_does_not_apply():
+    assert minify_js('f(\n  a,\n  b\n);\n{\n  x()\n}') == 'f(a,b);{x()}'
+
+
+def test_adjacent_plus_and_minus_are_not_merged():
+    assert minify_js('var z = a++ + +b - -c;') == 'var z=a++ + +b- -c;'
+
+
+# Шаблонные строки
+
+def test_template_literals_with_substitutions():
+    source = 'var t = `a ${ b + `c ${ d } e` } f  g`;\nvar o = { k: `${ {a: 1}.a }` };'
+    assert minify_js(source) == 'var t=`a ${b+`c ${d} e`} f  g`;var o={k:`${{a:1}.a}`};'
+
+
+def test_unclosed_template_literal():
+    with pytest.raises(MinifyError):
+        minify_js('var t = `a ${ b }')
+
+
+# Строки и комментарии
+
+def test_comment_markers_inside_strings():
+    source = 'var u = \'http://x.org/*a*/\'; // tail\nvar v = "a // b"; /* block */ var w = `/* t */`;'
+    assert minify_js(source) == 'var u=\'http://x.org/*a*/\';var v="a // b";var w=`/* t */`;'
+
+
+def test_comment_markers_inside_css_strings():
+    assert minify_css('a::after { content: "/* x */" ; } /* real */') == 'a::after{content:"/* x */"}'
+
+
+def test_closing_script_inside_strings():
+    html = '<script>var s = "<\\/script>";  var q = \'</scr\' + \'ipt>\';</script><p>x</p>'
+    minified, assets = optimize_html(html)
+    assert minified == '<script>var s="<\\/script>";var q=\'</scr\'+\'ipt>\';</script><p>x</p>'
+    assert minified.count('</script>') == 1 and not assets
+
+
+def test_slash_before_script_word_does_not_form_closing_tag():
+    assert '</script' not in minify_js('var a = b < /script>/.test(s);')
+
+
+# Сравнение с исходным кодом в node (если он установлен)
+
+SEMANTIC_CASES = [
+    'var b = 12, c = 3, d = 2; return b / c / d;',
+    'var s = "a/b//c"; return s.split(/\\//).length + (s.length) / 2;',
+    'var x = 3; if (x) /x  y/.test("x  y") && (x = 4); return x;',
+    'var n = 0, i = 3; while (i--) /a/g.exec("aa") && n++; return n;',
+    'var a = 1\nvar b = 2\nvar c = a\n++b\nreturn [a, b, c]',
+    'function f() { return\n1 }\nreturn [f()]',
+    'var d = 2; var t = `a ${ d + `b ${ d * 2 }` }  ${ {k: d}.k }`; return t;',
+    'var u = "http://x/*y*/"; // c\nvar v = \'a // b\'; /* c */ return u + v + `/* t */`;',
+    'var a = 1, b = 2; var z = a++ + +b - -a; return z;',
+    'var s = "<\\/script>"; return s + \'</scr\' + \'ipt>\';',
+]
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='node не установлен')
+@pytest.mark.parametrize('source', SEMANTIC_CASES)
+def test_minified_code_behaves_the_same(source):
+    def run(code):
+        script = f'console.log(JSON.stringify((function () {{\n{code}\n}})()))'
+        result = subprocess.run(['node', '-e', script], capture_output=True, text=True, timeout=30)
+        assert result.returncode == 0, result.stderr
+        return json.loads(result.stdout)
+
+    assert run(minify_js(source)) == run(source)
@@ -0,0 +1,74 @@
+import hashlib
+import os
+import tempfile
+from collections import namedtuple
+
+from storage import set_file_mode
+
+# Размер части при потоковом чтении загрузок
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+IngestResult = namedtuple('IngestResult', ['path', 'sha256', 'size'])
+
+
+class UnsafeContentError(Exception):
+    """Загруженный файл не прошел проверку на запрещенный контент"""
+
+
+def ingest_upload(file_storage, directory, filename=None, scanner=None, suffix='',
+                  chunk_size=UPLOAD_CHUNK_SIZE, blob_store=None):
+    """Сохраняет загруженный файл за один проход по его содержимому.
+
+    Каждая часть сразу пишется во временный файл в directory, добавляется
+    в SHA-256 и (если передан scanner) проверяется на запрещенные слова.
+    Только после успешной проверки временный файл переименовывается
+    в directory/filename, так что в памяти держится не больше одной части.
+    Без filename файл называется по хешу (<sha256><suffix>), и если такой
+    файл уже есть, повторная копия не сохраняется. С blob_store такой файл
+    кладется через blob_store.add() и сразу получает ссылку (ее отпускает
+    вызывающий код, если файл не понадобился).
+    Бросает UnsafeContentError, UnicodeDecodeError (при проверке) или OSError.
+    """
+    os.makedirs(directory, exist_ok=True)
+    hasher = hashlib.sha256()
+    scan = scanner.stream() if scanner else None
+    size = 0
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            set_file_mode(out.fileno())
+            while True:
+                chunk = file_storage.stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                hasher.update(chunk)
+                if scan:
+                    scan.feed_bytes(chunk)
+                out.write(chunk)
+
+        if scan:
+            scan.feed_bytes(b'', final=True)
+            is_safe, message = scan.verdict()
+            if not is_safe:
+                raise UnsafeContentError(message)
+
+        path = os.path.join(directory, filename or hasher.hexdigest() + suffix)
+        if filename is None and blob_store is not None:
+            relative = os.path.relpath(path, blob_store.static_dir).replace(os.sep, '/')
+            if not blob_store.add(tmp_path, relative):
+                raise OSError(f"Не удалось записать ссылку на {relative}")
+        elif filename is None and os.path.exists(path):
+            os.remove(tmp_path)
+            os.utime(path)  # свежий mtime защищает файл от сборщика мусора до записи ссылки
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    return IngestResult(path, hasher.hexdigest(), size)